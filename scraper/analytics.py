@@ -0,0 +1,150 @@
+"""Network metrics computed from the store with pandas/NumPy.
+
+Everything works on an integer edge list ("src follows dst"), so the cost is
+a handful of sorts and bincounts over the edges with no per-user Python loop:
+
+    python scraper/analytics.py --store data/user_data.db --output data/metrics.csv
+"""
+import argparse
+import logging
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from storage import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+def load_edges(store: SQLiteStore) -> Tuple[pd.Index, pd.DataFrame]:
+    """Load the deduplicated follow graph from the store.
+    Returns:
+        (usernames, edges): usernames maps node id to username, edges has
+        int columns src and dst meaning src follows dst
+    """
+    rows = pd.read_sql_query('SELECT username, kind, other FROM edges', store.conn)
+    is_follower = (rows['kind'] == 'followers').to_numpy()
+    # A follower entry of user U is the edge other -> U, a following entry is U -> other
+    src = np.where(is_follower, rows['other'].to_numpy(), rows['username'].to_numpy())
+    dst = np.where(is_follower, rows['username'].to_numpy(), rows['other'].to_numpy())
+
+    users = pd.read_sql_query('SELECT username FROM users ORDER BY rowid', store.conn)['username']
+    codes, usernames = pd.factorize(np.concatenate([users.to_numpy(), src, dst]))
+    offset = len(users)
+    edges = pd.DataFrame({
+        'src': codes[offset:offset + len(src)].astype(np.int64),
+        'dst': codes[offset + len(src):].astype(np.int64),
+    }).drop_duplicates(ignore_index=True)
+    return pd.Index(usernames, name='username'), edges
+
+
+def _pair_keys(a: np.ndarray, b: np.ndarray, n: int) -> np.ndarray:
+    return a.astype(np.int64) * n + b.astype(np.int64)
+
+
+def mutual_mask(edges: pd.DataFrame, n: int) -> np.ndarray:
+    """Boolean mask of edges whose reverse edge also exists."""
+    keys = _pair_keys(edges['src'].to_numpy(), edges['dst'].to_numpy(), n)
+    reverse = _pair_keys(edges['dst'].to_numpy(), edges['src'].to_numpy(), n)
+    return np.isin(reverse, keys)
+
+
+def node_metrics(store: SQLiteStore, celebrity_threshold: int = 3000) -> pd.DataFrame:
+    """Per-user degree, mutual follow and reciprocity metrics.
+
+    is_celebrity is re-derived from the larger of the scraped followers count
+    and the observed in-degree, rather than trusted from the stored flag.
+    """
+    usernames, edges = load_edges(store)
+    n = len(usernames)
+    src = edges['src'].to_numpy()
+    dst = edges['dst'].to_numpy()
+    mutual = mutual_mask(edges, n)
+
+    out_degree = np.bincount(src, minlength=n)
+    in_degree = np.bincount(dst, minlength=n)
+    mutual_count = np.bincount(src[mutual], minlength=n)
+
+    metrics = pd.DataFrame({
+        'in_degree': in_degree,
+        'out_degree': out_degree,
+        'mutual_follows': mutual_count,
+    }, index=usernames)
+    metrics['reciprocity'] = np.where(out_degree > 0, mutual_count / np.maximum(out_degree, 1), np.nan)
+
+    counts = pd.read_sql_query(
+        'SELECT username, followers_count, following_count FROM users', store.conn, index_col='username'
+    )
+    metrics = metrics.join(counts)
+    metrics['crawled'] = metrics['followers_count'].notna()
+    metrics[['followers_count', 'following_count']] = metrics[['followers_count', 'following_count']].fillna(0).astype(np.int64)
+    metrics['is_celebrity'] = np.maximum(metrics['followers_count'], metrics['in_degree']) > celebrity_threshold
+    return metrics
+
+
+def graph_summary(store: SQLiteStore) -> dict:
+    """Network-wide counts and the share of follows that are mutual."""
+    usernames, edges = load_edges(store)
+    mutual = mutual_mask(edges, len(usernames))
+    return {
+        'nodes': len(usernames),
+        'edges': len(edges),
+        'mutual_edges': int(mutual.sum()),
+        'reciprocity': float(mutual.mean()) if len(edges) else 0.0,
+    }
+
+
+def common_neighbour_counts(store: SQLiteStore, pairs: pd.DataFrame) -> pd.Series:
+    """Count shared neighbours (followers or following, either direction) for many user pairs at once.
+    Args:
+        pairs: DataFrame with username columns a and b
+    Returns:
+        Series of counts aligned with pairs
+    """
+    usernames, edges = load_edges(store)
+    n = len(usernames)
+    # Undirected neighbour table: node -> neighbour, both directions, deduplicated
+    neighbours = pd.DataFrame({
+        'node': np.concatenate([edges['src'].to_numpy(), edges['dst'].to_numpy()]),
+        'neighbour': np.concatenate([edges['dst'].to_numpy(), edges['src'].to_numpy()]),
+    }).drop_duplicates()
+    neighbour_keys = np.sort(_pair_keys(neighbours['node'].to_numpy(), neighbours['neighbour'].to_numpy(), n))
+
+    if len(neighbour_keys) == 0:
+        return pd.Series(0, index=pairs.index, name='common_neighbours')
+
+    # Expand each pair to a's neighbours, then keep those that are also b's neighbours
+    a = usernames.get_indexer(pairs['a'])
+    b = usernames.get_indexer(pairs['b'])
+    ids = pd.DataFrame({'pair': np.arange(len(pairs)), 'node': a, 'b': b})
+    candidates = ids[(ids['node'] >= 0) & (ids['b'] >= 0)].merge(neighbours, on='node')
+    keys = _pair_keys(candidates['b'].to_numpy(), candidates['neighbour'].to_numpy(), n)
+    position = np.minimum(np.searchsorted(neighbour_keys, keys), len(neighbour_keys) - 1)
+    is_common = neighbour_keys[position] == keys
+    counts = np.bincount(candidates['pair'].to_numpy()[is_common], minlength=len(pairs))
+    return pd.Series(counts, index=pairs.index, name='common_neighbours')
+
+
+def write_metrics(metrics: pd.DataFrame, path: str) -> None:
+    """Write metrics to Parquet (needs pyarrow) or CSV, chosen by file extension."""
+    if path.endswith('.parquet'):
+        metrics.to_parquet(path)
+    else:
+        metrics.to_csv(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compute network metrics from the scraper store')
+    parser.add_argument('--store', default='data/user_data.db', help='Path to the SQLite store')
+    parser.add_argument('--output', default='data/metrics.csv', help='Output file (.csv or .parquet)')
+    parser.add_argument('--celebrity-threshold', type=int, default=3000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    store = SQLiteStore(args.store)
+    metrics = node_metrics(store, args.celebrity_threshold)
+    write_metrics(metrics, args.output)
+    logger.info(f"Wrote metrics for {len(metrics)} users to {args.output}")
+    logger.info(f"Graph summary: {graph_summary(store)}")
+    store.close()
@@ -0,0 +1,273 @@
+"""Offline benchmark for InstagramScraper.
+
+Serves synthetic profile pages and follower dialogs from a local HTTP server,
+using the same selectors as the live site, and runs process_user and
+scroll_to_load_all against them, plus ResultWriter.write on its own. Needs Chrome but no
+Instagram account:
+
+    python scraper/benchmark.py --entries 1000 --users 20
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Dict
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.chrome.options import Options
+
+from instagram_scraper import InstagramScraper
+from storage import SQLiteStore
+from rate_limiter import RequestScheduler
+from instrumentation import CommandCounter
+from delta import END_OF_LIST
+from pipeline import FULL
+
+# Same classes as the first dialog_scrollable candidate in selector_registry.SELECTOR_ROLES
+SCROLLABLE_CLASSES = 'xyi19xy x1ccrb07 xtf3nb5 x1pc53ja x1lliihq x1iyjqo2 xs83m0k xz65tgg x1rife3k x1n2onr6'
+
+PROFILE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><title>{username}</title></head>
+<body>
+<header><section>
+  <span class="x1lliihq">{profile_name}</span>
+  <a href="/{username}/followers/" data-kind="followers">{followers_count} followers</a>
+  <a href="/{username}/following/" data-kind="following">{following_count} following</a>
+</section></header>
+<script>
+const USERNAME = {username_json};
+const TOTALS = {{followers: {followers_count}, following: {following_count}}};
+const LATENCY_MS = {latency_ms};
+const PAGE_SIZE = 12;
+
+function fill(list, kind) {{
+  // Like the real dialog: keep a screenful or so of entries loaded below the viewport
+  while (list.dataset.rendered < TOTALS[kind] &&
+         list.scrollHeight - list.scrollTop - list.clientHeight < 1500) {{
+    const start = Number(list.dataset.rendered);
+    const end = Math.min(start + PAGE_SIZE, TOTALS[kind]);
+    for (let i = start; i < end; i++) {{
+      const row = document.createElement('div');
+      row.style.height = '50px';
+      const name = USERNAME + '_' + kind[0] + i;
+      row.innerHTML = '<a role="link" href="https://www.instagram.com/' + name + '/">' + name + '</a><button>Follow</button>';
+      list.appendChild(row);
+    }}
+    list.dataset.rendered = end;
+  }}
+}}
+
+document.querySelectorAll('a[data-kind]').forEach((link) => {{
+  link.addEventListener('click', (event) => {{
+    event.preventDefault();
+    const kind = link.dataset.kind;
+    const dialog = document.createElement('div');
+    dialog.setAttribute('role', 'dialog');
+    dialog.innerHTML = '<div class="{scrollable_classes}" style="height: 400px; overflow-y: auto;"></div>';
+    document.body.appendChild(dialog);
+    const list = dialog.firstChild;
+    list.dataset.rendered = 0;
+    let pending = false;
+    const load = () => {{
+      if (pending) return;
+      pending = true;
+      setTimeout(() => {{ pending = false; fill(list, kind); }}, LATENCY_MS);
+    }};
+    list.addEventListener('scroll', load);
+    load();
+  }});
+}});
+
+document.addEventListener('keydown', (event) => {{
+  if (event.key === 'Escape') {{
+    document.querySelectorAll("div[role='dialog']").forEach((dialog) => dialog.remove());
+  }}
+}});
+</script>
+</body>
+</html>
+"""
+
+
+class SyntheticInstagram:
+    """Local HTTP server standing in for instagram.com profile pages.
+
+    Every path /<username>/ is a profile. The user named big_username has
+    `entries` followers and following; every other user has `small_entries`.
+    """
+
+    def __init__(self, entries: int = 1000, small_entries: int = 50, latency_ms: int = 50,
+                 big_username: str = 'bench_big'):
+        self.entries = entries
+        self.small_entries = small_entries
+        self.latency_ms = latency_ms
+        self.big_username = big_username
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def render_profile(self, username: str) -> str:
+        count = self.entries if username == self.big_username else self.small_entries
+        return PROFILE_TEMPLATE.format(
+            username=username,
+            username_json=json.dumps(username),
+            profile_name=f'Bench {username}',
+            followers_count=count,
+            following_count=count,
+            latency_ms=self.latency_ms,
+            scrollable_classes=SCROLLABLE_CLASSES,
+        )
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                username = self.path.strip('/').split('/')[0]
+                if not username:
+                    self.send_error(404)
+                    return
+                body = site.render_profile(username).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def measure(counter: CommandCounter, fn: Callable[[], object]) -> Dict[str, float]:
+    """Run fn and return its wall time, round trips and peak Python memory."""
+    tracemalloc.start()
+    commands = counter.count
+    start = time.perf_counter()
+    fn()
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'wall_s': round(wall, 3),
+        'round_trips': counter.count - commands,
+        'peak_mb': round(peak / 1024 / 1024, 2),
+    }
+
+
+def build_scraper(site: SyntheticInstagram, store_path: str, headless: bool = True) -> InstagramScraper:
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument('--headless=new')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--window-size=1920,1080')
+    driver = webdriver.Chrome(options=chrome_options)
+
+    scraper = InstagramScraper(store=SQLiteStore(store_path), driver=driver)
+    scraper.tracer.close()  # Keep benchmark spans out of the real trace file
+    scraper.selectors.path = None  # Nor the selectors that matched on the synthetic pages
+    scraper.base_url = site.base_url
+    # Measure the scraper itself, not the pacing
+    scraper.scheduler = RequestScheduler(10 ** 9, 10 ** 9, 0, burst=10 ** 9)
+    scraper.phase_minimums = {phase: 0 for phase in scraper.phase_minimums}
+    scraper.min_delay = 0
+    return scraper
+
+
+def run_benchmark(entries: int = 1000, users: int = 20, saves: int = 200, latency_ms: int = 50,
+                  headless: bool = True) -> dict:
+    site = SyntheticInstagram(entries=entries, latency_ms=latency_ms).start()
+    tmp_dir = tempfile.mkdtemp(prefix='ig-bench-')
+    scraper = build_scraper(site, os.path.join(tmp_dir, 'bench.db'), headless)
+    counter = scraper.tracer.counter
+    results = {'config': {'entries': entries, 'users': users, 'saves': saves, 'latency_ms': latency_ms}}
+
+    try:
+        # Full process_user on small profiles
+        usernames = [f'bench_user_{i:04d}' for i in range(users)]
+        metrics = measure(counter, lambda: [scraper.process_user(u) for u in usernames])
+        metrics['users_per_min'] = round(users / metrics['wall_s'] * 60, 1) if metrics['wall_s'] else None
+        metrics['round_trips_per_user'] = round(metrics['round_trips'] / users, 1)
+        results['process_user'] = metrics
+
+        # Scrolling one large followers dialog
+        scraper.navigate(f'{site.base_url}/{site.big_username}/')
+        scraper.waiter.for_profile_header()
+        scraper.driver.find_element(By.CSS_SELECTOR, "a[data-kind='followers']").click()
+        dialog = scraper.driver.find_element(By.CSS_SELECTOR, "div[role='dialog']")
+        scraper.waiter.for_dialog_list(dialog)
+        found = []
+        metrics = measure(counter, lambda: found.extend(scraper.scroll_to_load_all(dialog)[0]))
+        metrics['usernames_found'] = len(found)
+        metrics['usernames_expected'] = entries
+        results['scroll_to_load_all'] = metrics
+
+        # Persisting large users the way the background pipeline does, in
+        # batches through ResultWriter, no browser involved
+        profile = {'profile_name': 'Bench', 'followers_count': entries, 'following_count': entries,
+                   'is_private': False}
+        written = [{
+            'username': f'save_user_{i}',
+            'mode': FULL,
+            'profile': profile,
+            'followers': [f'save_f{j}' for j in range(entries)],
+            'following': [f'save_g{j}' for j in range(entries)],
+            'stopped': {'followers': END_OF_LIST, 'following': END_OF_LIST},
+        } for i in range(saves)]
+        batch_size = scraper.persist_batch_size
+
+        def write_all():
+            with scraper.tracer.span('result_writer'):
+                for start in range(0, saves, batch_size):
+                    scraper.writer.write(written[start:start + batch_size])
+
+        metrics = measure(counter, write_all)
+        metrics['ms_per_save'] = round(metrics['wall_s'] / saves * 1000, 2)
+        metrics['batch_size'] = batch_size
+        results['result_writer'] = metrics
+    finally:
+        scraper.driver.quit()
+        scraper.store.close()
+        site.stop()
+    results['spans'] = scraper.tracer.summary()
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark InstagramScraper against a local synthetic site')
+    parser.add_argument('--entries', type=int, default=1000, help='Entries in the large followers dialog')
+    parser.add_argument('--users', type=int, default=20, help='Small profiles to run process_user on')
+    parser.add_argument('--saves', type=int, default=200, help='Users to write through ResultWriter')
+    parser.add_argument('--latency-ms', type=int, default=50, help='Simulated delay before the dialog loads more entries')
+    parser.add_argument('--headed', action='store_true', help='Show the browser window')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run_benchmark(args.entries, args.users, args.saves, args.latency_ms, headless=not args.headed)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
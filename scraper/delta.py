@@ -0,0 +1,54 @@
+from typing import Iterable, List, Tuple
+
+
+# Why scrolling a connection list stopped (see scroll_to_load_all)
+END_OF_LIST = 'end_of_list'  # Reached the bottom: the whole list was read
+KNOWN_RUN = 'known_run'      # Reached a run of stored usernames: everything below is stored
+INTERRUPTED = 'interrupted'  # Cut short (rate limit popup, error): only a prefix was read
+
+
+def connection_delta(streamed: List[str], stored: List[str],
+                     stopped: str = END_OF_LIST) -> Tuple[List[str], List[str]]:
+    """Compare a freshly scrolled connection list with the stored one.
+
+    Dialogs list the newest connections first. If scrolling stopped on a run
+    of stored usernames (stopped=KNOWN_RUN), only the part of the stored list
+    down to that run was compared: entries past it are assumed unchanged.
+    If it reached the end of the list, the whole stored list was compared,
+    however many stored usernames the stream ended in.
+
+    A stream that was cut short (stopped=INTERRUPTED) only says who is
+    there, not who left: its new usernames are added and nothing is
+    removed. An empty stream is treated as a failed read rather than
+    everyone leaving.
+    Returns:
+        (added, removed): added in dialog order (newest first), removed in stored order
+    """
+    if not streamed:
+        return [], []
+
+    stored_position = {username: position for position, username in enumerate(stored)}
+    added = [username for username in streamed if username not in stored_position]
+    if stopped == INTERRUPTED:
+        return added, []
+
+    known_run = 0
+    for username in reversed(streamed):
+        if username not in stored_position:
+            break
+        known_run += 1
+
+    if stopped == KNOWN_RUN and known_run:
+        compared = max(stored_position[username] for username in streamed[-known_run:]) + 1
+    else:
+        compared = len(stored)
+
+    seen = set(streamed)
+    removed = [username for username in stored[:compared] if username not in seen]
+    return added, removed
+
+
+def apply_delta(stored: Iterable[str], added: List[str], removed: List[str]) -> List[str]:
+    """The connection list after a delta: added entries on top, removed ones dropped."""
+    dropped = set(removed) | set(added)
+    return list(added) + [username for username in stored if username not in dropped]
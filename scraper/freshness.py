@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+from typing import Optional
+
+
+class FreshnessPolicy:
+    """Decides whether a stored user is recent enough to skip re-scraping.
+
+    Counts (one profile page load) and connection lists (scrolling both
+    dialogs) have separate TTLs, since the lists are far more expensive to
+    refresh and change more slowly.
+    """
+
+    def __init__(self, counts_ttl: timedelta = timedelta(days=1), connections_ttl: timedelta = timedelta(days=7)):
+        self.counts_ttl = counts_ttl
+        self.connections_ttl = connections_ttl
+
+    def counts_fresh(self, counts_updated: Optional[float], now: float = None) -> bool:
+        return self._is_fresh(counts_updated, self.counts_ttl, now)
+
+    def connections_fresh(self, connections_updated: Optional[float], now: float = None) -> bool:
+        return self._is_fresh(connections_updated, self.connections_ttl, now)
+
+    def stale_before(self, now: float = None) -> float:
+        """Epoch time before which connection lists count as stale."""
+        now = time.time() if now is None else now
+        return now - self.connections_ttl.total_seconds()
+
+    @staticmethod
+    def _is_fresh(updated: Optional[float], ttl: timedelta, now: float = None) -> bool:
+        if updated is None:
+            return False
+        now = time.time() if now is None else now
+        return now - updated < ttl.total_seconds()
@@ -0,0 +1,274 @@
+import time
+from typing import Dict, Iterable, Optional
+from storage import SQLiteStore
+from bloom import BloomFilter
+
+PENDING = 'pending'
+IN_PROGRESS = 'in_progress'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class CrawlFrontier:
+    """Persistent crawl queue stored next to the scraped data.
+
+    Every user has a status (pending/in_progress/done/failed) and an attempt
+    count, so a crawl that is interrupted can pick up where it stopped and
+    users finished in earlier runs are never visited again.
+
+    Users are crawled breadth first by depth (hops from the main user). Within
+    a depth, users linked to more crawled users come first, since their lists
+    add the most to the network per page load, and known celebrities (whose
+    lists are never scraped) come last. Celebrity status is only known for
+    users whose counts are already in the store, e.g. imported or refreshed
+    ones; a newly discovered user's counts are not known until it is visited,
+    so most candidates are ordered by depth and score alone.
+
+    The frontier table is the exact seen-set. A Bloom filter in front of it
+    answers "never seen" without touching the disk, which is the common case
+    for newly discovered usernames, and stays small with millions of them.
+    """
+
+    def __init__(self, store: SQLiteStore, max_attempts: int = 3, celebrity_threshold: int = 3000):
+        self.store = store
+        self.conn = store.conn
+        self.max_attempts = max_attempts
+        self.celebrity_threshold = celebrity_threshold
+        self.create_tables()
+        self.seen = self._load_seen()
+
+    def create_tables(self):
+        with self.store.transaction():
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS frontier (
+                    username TEXT PRIMARY KEY,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    updated_at REAL,
+                    depth INTEGER NOT NULL DEFAULT 0,
+                    score INTEGER NOT NULL DEFAULT 0,
+                    celebrity INTEGER NOT NULL DEFAULT 0,
+                    expanded_to INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            # Frontiers created before prioritized crawling; their done users
+            # count as never expanded, which at worst requeues known users
+            columns = {row[1] for row in self.conn.execute('PRAGMA table_info(frontier)')}
+            for column in ('depth', 'score', 'celebrity', 'expanded_to'):
+                if column not in columns:
+                    self.conn.execute(f'ALTER TABLE frontier ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0')
+            # Crawled user (source) linked to another user (target), so a score
+            # can be recounted rather than incremented and never counts a link twice
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS frontier_links (
+                    target TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    PRIMARY KEY (target, source)
+                ) WITHOUT ROWID
+            ''')
+            self.conn.execute('DROP INDEX IF EXISTS frontier_status')
+            self.conn.execute(
+                'CREATE INDEX IF NOT EXISTS frontier_priority ON frontier (status, depth, celebrity, score DESC)'
+            )
+
+    def _load_seen(self, capacity: int = None) -> BloomFilter:
+        if capacity is None:
+            capacity = 2 * self.conn.execute('SELECT COUNT(*) FROM frontier').fetchone()[0]
+        seen = BloomFilter(max(capacity, 100_000))
+        seen.update(username for username, in self.conn.execute('SELECT username FROM frontier'))
+        return seen
+
+    def __contains__(self, username: str) -> bool:
+        if username not in self.seen:
+            return False
+        return self.status(username) is not None
+
+    def add(self, username: str, depth: int = 0) -> None:
+        self.add_many([username], depth)
+
+    def add_many(self, usernames: Iterable[str], depth: int = 0) -> int:
+        """Queue users that are not in the frontier yet.
+        Returns:
+            Number of newly queued users
+        """
+        with self.store.transaction():
+            return self._queue(usernames, depth)
+
+    def set_root(self, username: str) -> None:
+        """Make username the user depths are counted from.
+
+        A seed found by an earlier crawl would keep the depth it was found at
+        and queue nothing at a small max_depth; as the root it is at depth 0
+        and is expanded again when completed or by expand.
+        """
+        with self.store.transaction():
+            self.conn.execute('''
+                INSERT INTO frontier (username, status, updated_at, depth) VALUES (?, ?, ?, 0)
+                ON CONFLICT(username) DO UPDATE SET depth = 0, expanded_to = 0
+            ''', (username, PENDING, time.time()))
+        self.seen.add(username)
+
+    def complete(self, username: str, neighbours: Iterable[str], max_depth: int) -> int:
+        """Mark a crawled user done and queue its followers and following.
+
+        A neighbour's score is the number of distinct crawled users linked to
+        it. The links are recorded, so completing the same user again (the
+        main user on every run, or a re-crawl) does not raise any score.
+        Links are never dropped: someone who unfollowed still counts. Neighbours
+        are only queued and scored while the user is fewer than max_depth hops
+        from the main user; the max_depth is recorded, so a later run with a
+        larger one can expand the user again (see expand).
+        Returns:
+            Number of newly queued users
+        """
+        depth = self.depth(username) or 0
+        with self.store.transaction():
+            self.conn.execute('''
+                INSERT INTO frontier (username, status, updated_at, depth) VALUES (?, ?, ?, ?)
+                ON CONFLICT(username) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at
+            ''', (username, DONE, time.time(), depth))
+            self.seen.add(username)
+            return self._expand(username, depth, neighbours, max_depth)
+
+    def expand(self, max_depth: int) -> int:
+        """Queue the stored neighbours of done users that were expanded to a smaller max_depth.
+
+        A user completed max_depth hops from the main user queued nothing; if
+        a later run asks for more hops, its followers and following are read
+        back from the store and queued one hop deeper, shallowest users first.
+        Returns:
+            Number of newly queued users
+        """
+        queued = 0
+        with self.store.transaction():
+            while True:
+                rows = self.conn.execute('''
+                    SELECT username, depth FROM frontier
+                    WHERE status = ? AND depth < ? AND expanded_to < ?
+                    ORDER BY depth
+                    LIMIT 1000
+                ''', (DONE, max_depth, max_depth)).fetchall()
+                if not rows:
+                    return queued
+                for username, depth in rows:
+                    neighbours = [other for other, in self.conn.execute(
+                        'SELECT other FROM edges WHERE username = ? ORDER BY kind, position', (username,)
+                    )]
+                    queued += self._expand(username, depth, neighbours, max_depth)
+
+    def _expand(self, username: str, depth: int, neighbours: Iterable[str], max_depth: int) -> int:
+        # Runs inside the caller's transaction
+        self.conn.execute(
+            'UPDATE frontier SET expanded_to = MAX(expanded_to, ?) WHERE username = ?', (max_depth, username)
+        )
+        if depth >= max_depth:
+            return 0
+        return self._queue((other for other in neighbours if other != username), depth + 1, source=username)
+
+    def _queue(self, usernames: Iterable[str], depth: int, source: str = None) -> int:
+        # Runs inside the caller's transaction
+        now = time.time()
+        usernames = list(dict.fromkeys(usernames))
+        new = []
+        closer = []
+        for username in usernames:
+            # Only a possible hit in the filter needs a lookup to tell whether it really is there
+            row = self.conn.execute(
+                'SELECT depth FROM frontier WHERE username = ?', (username,)
+            ).fetchone() if username in self.seen else None
+            if row is None:
+                self.seen.add(username)
+                new.append(username)
+            elif row[0] > depth:
+                closer.append(username)
+        # Known users found closer to the root than before, e.g. around a new
+        # seed, take the smaller depth and are expanded again from there
+        self.conn.executemany(
+            'UPDATE frontier SET depth = ?, expanded_to = 0 WHERE username = ?',
+            ((depth, username) for username in closer)
+        )
+        # Users the store already knows to be celebrities go to the back of their depth
+        self.conn.executemany('''
+            INSERT OR IGNORE INTO frontier (username, status, updated_at, depth, celebrity)
+            VALUES (?, ?, ?, ?, COALESCE((SELECT followers_count > ? FROM users WHERE username = ?), 0))
+        ''', ((username, PENDING, now, depth, self.celebrity_threshold, username) for username in new))
+        if source is not None:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO frontier_links (target, source) VALUES (?, ?)',
+                ((username, source) for username in usernames)
+            )
+            self.conn.executemany(
+                'UPDATE frontier SET score = (SELECT COUNT(*) FROM frontier_links WHERE target = ?) WHERE username = ?',
+                ((username, username) for username in usernames)
+            )
+        if len(self.seen) > self.seen.capacity:
+            # Past its capacity the filter's false positive rate climbs, rebuild it larger
+            self.seen = self._load_seen(2 * len(self.seen))
+        return len(new)
+
+    def recover(self) -> int:
+        """Requeue users left in progress by a run that did not finish.
+        Returns:
+            Number of requeued users
+        """
+        with self.store.transaction():
+            cursor = self.conn.execute(
+                'UPDATE frontier SET status = ? WHERE status = ?', (PENDING, IN_PROGRESS)
+            )
+        return cursor.rowcount
+
+    def next_user(self) -> Optional[str]:
+        """Return the next user to process, pending users before retries of failed ones.
+
+        Shallower users first, then non-celebrities, then the highest score.
+        """
+        for status, attempts in ((PENDING, None), (FAILED, self.max_attempts)):
+            row = self.conn.execute('''
+                SELECT username FROM frontier
+                WHERE status = ? AND (? IS NULL OR attempts < ?)
+                ORDER BY depth, celebrity, score DESC
+                LIMIT 1
+            ''', (status, attempts, attempts)).fetchone()
+            if row:
+                return row[0]
+        return None
+
+    def mark_in_progress(self, username: str) -> None:
+        with self.store.transaction():
+            self.conn.execute('''
+                INSERT INTO frontier (username, status, attempts, updated_at) VALUES (?, ?, 1, ?)
+                ON CONFLICT(username) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = attempts + 1,
+                    updated_at = excluded.updated_at
+            ''', (username, IN_PROGRESS, time.time()))
+        self.seen.add(username)
+
+    def mark_done(self, username: str) -> None:
+        self._set_status(username, DONE)
+
+    def mark_failed(self, username: str, error: str = None) -> None:
+        self._set_status(username, FAILED, error)
+
+    def status(self, username: str) -> Optional[str]:
+        row = self.conn.execute('SELECT status FROM frontier WHERE username = ?', (username,)).fetchone()
+        return row[0] if row else None
+
+    def depth(self, username: str) -> Optional[int]:
+        row = self.conn.execute('SELECT depth FROM frontier WHERE username = ?', (username,)).fetchone()
+        return row[0] if row else None
+
+    def is_done(self, username: str) -> bool:
+        return self.status(username) == DONE
+
+    def counts(self) -> Dict[str, int]:
+        """Number of users per status."""
+        return dict(self.conn.execute('SELECT status, COUNT(*) FROM frontier GROUP BY status'))
+
+    def _set_status(self, username: str, status: str, error: str = None) -> None:
+        with self.store.transaction():
+            self.conn.execute(
+                'UPDATE frontier SET status = ?, last_error = ?, updated_at = ? WHERE username = ?',
+                (status, error, time.time(), username)
+            )
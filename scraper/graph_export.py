@@ -0,0 +1,108 @@
+import json
+from typing import Dict, List, Tuple
+from storage import SQLiteStore, write_json_atomic
+from layout import layout_graph
+
+GRAPH_FORMAT_VERSION = 1
+
+# Bits of edges.kind: which scraped list an edge was seen in
+SEEN_IN_FOLLOWERS = 1  # target's followers list
+SEEN_IN_FOLLOWING = 2  # source's following list
+
+
+def build_compact_graph(store: SQLiteStore, root: str = None) -> dict:
+    """Turn the stored network into the compact graph read by NetworkGraph.tsx.
+
+    Usernames are interned to integer ids; crawled users come first in store
+    order. graph['root'] is the id of root, the user the frontend centres on,
+    or 0 (the first stored user, normally the main user) if root is not
+    given or was not crawled. Node attributes are stored column-wise and
+    the deduplicated "source follows target" edges as CSR arrays: the targets
+    of node i are edges.indices[edges.indptr[i]:edges.indptr[i + 1]].
+    """
+    ids: Dict[str, int] = {}
+    usernames: List[str] = []
+
+    def intern(username: str) -> int:
+        node_id = ids.get(username)
+        if node_id is None:
+            node_id = ids[username] = len(usernames)
+            usernames.append(username)
+        return node_id
+
+    records = {}
+    edges: Dict[Tuple[int, int], int] = {}
+    users = list(store.iter_users())
+    for username, record in users:
+        intern(username)
+        records[username] = record
+    for username, record in users:
+        user_id = ids[username]
+        for follower in record['followers']:
+            key = (intern(follower), user_id)
+            edges[key] = edges.get(key, 0) | SEEN_IN_FOLLOWERS
+        for followed in record['following']:
+            key = (user_id, intern(followed))
+            edges[key] = edges.get(key, 0) | SEEN_IN_FOLLOWING
+
+    node_count = len(usernames)
+    indptr = [0] * (node_count + 1)
+    indices = []
+    kinds = []
+    for source, target in sorted(edges):
+        indptr[source + 1] += 1
+        indices.append(target)
+        kinds.append(edges[(source, target)])
+    for i in range(node_count):
+        indptr[i + 1] += indptr[i]
+
+    empty = {}
+    return {
+        'version': GRAPH_FORMAT_VERSION,
+        'root': ids[root] if root in records else 0,
+        'nodes': {
+            'id': usernames,
+            'followers_count': [records.get(u, empty).get('followers_count', 0) for u in usernames],
+            'following_count': [records.get(u, empty).get('following_count', 0) for u in usernames],
+            'is_celebrity': [int(records.get(u, empty).get('is_celebrity', False)) for u in usernames],
+            'profile_name': [records.get(u, empty).get('profile_name', '') for u in usernames],
+            'crawled': [int(u in records) for u in usernames],
+        },
+        'edges': {
+            'indptr': indptr,
+            'indices': indices,
+            'kind': kinds,
+        },
+    }
+
+
+def load_positions(path: str) -> Dict[str, Tuple[float, float]]:
+    """Read the node positions stored in a previously exported graph."""
+    try:
+        with open(path, 'r') as f:
+            nodes = json.load(f)['nodes']
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return {}
+    if 'x' not in nodes:
+        return {}
+    return {username: (x, y) for username, x, y in zip(nodes['id'], nodes['x'], nodes['y'])}
+
+
+def export_compact_graph(store: SQLiteStore, path: str = 'public/graph.json', layout: bool = True,
+                         layout_iterations: int = 200, root: str = None) -> dict:
+    """Write the compact graph as minified JSON.
+
+    With layout enabled, node positions are computed here and stored as
+    nodes.x / nodes.y so the frontend can draw without simulating. Positions
+    from the previous export at path are reused, so only new nodes and their
+    neighbours move.
+    Returns:
+        Dict with the node and edge counts
+    """
+    graph = build_compact_graph(store, root)
+    if layout:
+        positions = layout_graph(graph, load_positions(path), layout_iterations)
+        graph['nodes']['x'] = [round(float(x), 1) for x in positions[:, 0]]
+        graph['nodes']['y'] = [round(float(y), 1) for y in positions[:, 1]]
+    write_json_atomic(path, graph, separators=(',', ':'))
+    return {'nodes': len(graph['nodes']['id']), 'edges': len(graph['edges']['indices'])}
@@ -0,0 +1,214 @@
+import time
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from storage import SQLiteStore
+
+KINDS = ('followers', 'following')
+ADD = 1
+REMOVE = 0
+
+
+def encode_ids(ids: Iterable[int]) -> bytes:
+    """Pack a set of user ids as zlib-compressed gaps between the sorted ids."""
+    previous = 0
+    gaps = array('I')
+    for user_id in sorted(ids):
+        gaps.append(user_id - previous)
+        previous = user_id
+    return zlib.compress(gaps.tobytes())
+
+
+def decode_ids(data: bytes) -> List[int]:
+    gaps = array('I')
+    gaps.frombytes(zlib.decompress(data))
+    ids = []
+    total = 0
+    for gap in gaps:
+        total += gap
+        ids.append(total)
+    return ids
+
+
+class HistoryStore:
+    """Versioned follower/following lists kept next to the scraped data.
+
+    Usernames are interned to integer ids. Each change to a list is one
+    (user, kind, time, add/remove, other) row, so storage grows with churn
+    rather than with network size times the number of runs. Every
+    snapshot_every changes a full list is stored as a compressed snapshot,
+    so reconstructing a list at some time replays at most that many rows.
+    """
+
+    def __init__(self, store: SQLiteStore, snapshot_every: int = 100):
+        self.store = store
+        self.conn = store.conn
+        self.snapshot_every = snapshot_every
+        self.create_tables()
+
+    def create_tables(self):
+        with self.store.transaction():
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS history_ids (
+                    id INTEGER PRIMARY KEY,
+                    username TEXT NOT NULL UNIQUE
+                )
+            ''')
+            # kind is the index into KINDS, op is ADD or REMOVE
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS history_deltas (
+                    user_id INTEGER NOT NULL,
+                    kind INTEGER NOT NULL,
+                    ts REAL NOT NULL,
+                    op INTEGER NOT NULL,
+                    other_id INTEGER NOT NULL
+                )
+            ''')
+            self.conn.execute(
+                'CREATE INDEX IF NOT EXISTS history_deltas_user ON history_deltas (user_id, kind, ts)'
+            )
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS history_snapshots (
+                    user_id INTEGER NOT NULL,
+                    kind INTEGER NOT NULL,
+                    ts REAL NOT NULL,
+                    ids BLOB NOT NULL,
+                    PRIMARY KEY (user_id, kind, ts)
+                ) WITHOUT ROWID
+            ''')
+
+    def record_list(self, username: str, kind: str, current: Iterable[str], ts: float = None) -> None:
+        """Record a freshly scraped full list, storing only its difference from the last known one."""
+        ts = time.time() if ts is None else ts
+        current = set(current)
+        with self.store.transaction():
+            ids = self._intern_many([username, *current])
+            user_id, kind_id = ids[username], KINDS.index(kind)
+            if self._latest_snapshot(user_id, kind_id, ts) is None:
+                # First sighting of this list: it is the starting point, not a change
+                self._snapshot(user_id, kind_id, ts, (ids[other] for other in current))
+                return
+            previous = set(self._ids_as_of(user_id, kind_id, ts))
+            current_ids = {ids[other] for other in current}
+            self.conn.executemany(
+                'INSERT INTO history_deltas (user_id, kind, ts, op, other_id) VALUES (?, ?, ?, ?, ?)',
+                [(user_id, kind_id, ts, ADD, other_id) for other_id in current_ids - previous]
+                + [(user_id, kind_id, ts, REMOVE, other_id) for other_id in previous - current_ids]
+            )
+            self._maybe_snapshot(user_id, kind_id, ts)
+
+    def changes(self, username: str, kind: str, start: float, end: float) -> Tuple[List[str], List[str]]:
+        """Who was added to or removed from a user's list between start and end.
+
+        Someone who followed and unfollowed again inside the window shows up
+        in neither list.
+        Returns:
+            (added, removed) usernames
+        """
+        user_id = self._user_id(username)
+        if user_id is None:
+            return [], []
+        first_op: Dict[int, int] = {}
+        last_op: Dict[int, int] = {}
+        for op, other_id in self.conn.execute('''
+            SELECT op, other_id FROM history_deltas
+            WHERE user_id = ? AND kind = ? AND ts > ? AND ts <= ?
+            ORDER BY ts, rowid
+        ''', (user_id, KINDS.index(kind), start, end)):
+            first_op.setdefault(other_id, op)
+            last_op[other_id] = op
+        # An add first means they were absent at start, a remove first that they were present
+        added = [other_id for other_id, op in last_op.items() if op == ADD and first_op[other_id] == ADD]
+        removed = [other_id for other_id, op in last_op.items() if op == REMOVE and first_op[other_id] == REMOVE]
+        names = self._usernames(added + removed)
+        return [names[other_id] for other_id in added], [names[other_id] for other_id in removed]
+
+    def as_of(self, username: str, kind: str, when: float) -> Optional[Set[str]]:
+        """A user's list as it was at time when, None if it had not been scraped yet."""
+        user_id = self._user_id(username)
+        if user_id is None:
+            return None
+        ids = self._ids_as_of(user_id, KINDS.index(kind), when)
+        if ids is None:
+            return None
+        names = self._usernames(ids)
+        return {names[other_id] for other_id in ids}
+
+    def graph_as_of(self, when: float) -> Dict[str, Dict[str, List[str]]]:
+        """Every recorded user's followers and following as they were at time when."""
+        graph: Dict[str, Dict[str, List[str]]] = {}
+        rows = self.conn.execute('SELECT DISTINCT user_id, kind FROM history_snapshots WHERE ts <= ?', (when,)).fetchall()
+        lists = {(user_id, kind_id): self._ids_as_of(user_id, kind_id, when) for user_id, kind_id in rows}
+        names = self._usernames({user_id for user_id, _ in lists} | {i for ids in lists.values() for i in ids})
+        for (user_id, kind_id), ids in lists.items():
+            record = graph.setdefault(names[user_id], {kind: [] for kind in KINDS})
+            record[KINDS[kind_id]] = sorted(names[other_id] for other_id in ids)
+        return graph
+
+    def _ids_as_of(self, user_id: int, kind_id: int, when: float) -> Optional[Set[int]]:
+        # Latest snapshot at or before when, plus the deltas recorded after it
+        snapshot = self._latest_snapshot(user_id, kind_id, when)
+        if snapshot is None:
+            return None
+        snapshot_ts, data = snapshot
+        ids = set(decode_ids(data))
+        for op, other_id in self.conn.execute('''
+            SELECT op, other_id FROM history_deltas
+            WHERE user_id = ? AND kind = ? AND ts > ? AND ts <= ?
+            ORDER BY ts, rowid
+        ''', (user_id, kind_id, snapshot_ts, when)):
+            if op == ADD:
+                ids.add(other_id)
+            else:
+                ids.discard(other_id)
+        return ids
+
+    def _latest_snapshot(self, user_id: int, kind_id: int, when: float) -> Optional[Tuple[float, bytes]]:
+        return self.conn.execute('''
+            SELECT ts, ids FROM history_snapshots
+            WHERE user_id = ? AND kind = ? AND ts <= ?
+            ORDER BY ts DESC LIMIT 1
+        ''', (user_id, kind_id, when)).fetchone()
+
+    def _maybe_snapshot(self, user_id: int, kind_id: int, ts: float) -> None:
+        snapshot_ts = self._latest_snapshot(user_id, kind_id, ts)[0]
+        pending = self.conn.execute(
+            'SELECT COUNT(*) FROM history_deltas WHERE user_id = ? AND kind = ? AND ts > ? AND ts <= ?',
+            (user_id, kind_id, snapshot_ts, ts)
+        ).fetchone()[0]
+        if pending >= self.snapshot_every:
+            self._snapshot(user_id, kind_id, ts, self._ids_as_of(user_id, kind_id, ts))
+
+    def _snapshot(self, user_id: int, kind_id: int, ts: float, ids: Iterable[int]) -> None:
+        self.conn.execute(
+            'INSERT OR REPLACE INTO history_snapshots (user_id, kind, ts, ids) VALUES (?, ?, ?, ?)',
+            (user_id, kind_id, ts, encode_ids(ids))
+        )
+
+    def _intern_many(self, usernames: List[str]) -> Dict[str, int]:
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO history_ids (username) VALUES (?)', ((username,) for username in usernames)
+        )
+        ids = {}
+        unique = list(dict.fromkeys(usernames))
+        # Stay under SQLite's limit on bound parameters
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            ids.update(self.conn.execute(
+                f'SELECT username, id FROM history_ids WHERE username IN ({",".join("?" * len(chunk))})', chunk
+            ))
+        return ids
+
+    def _user_id(self, username: str) -> Optional[int]:
+        row = self.conn.execute('SELECT id FROM history_ids WHERE username = ?', (username,)).fetchone()
+        return row[0] if row else None
+
+    def _usernames(self, ids: Iterable[int]) -> Dict[int, str]:
+        ids = list(set(ids))
+        names = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            names.update(self.conn.execute(
+                f'SELECT id, username FROM history_ids WHERE id IN ({",".join("?" * len(chunk))})', chunk
+            ))
+        return names
@@ -1,7 +1,9 @@
 import os
+import sys
 import time
+import logging
+import argparse
 import random
-import pandas as pd
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -11,120 +13,316 @@ from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.keys import Keys
 from dotenv import load_dotenv
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import json
 from datetime import datetime, timedelta
+from storage import SQLiteStore, write_json_atomic
+from graph_export import export_compact_graph, load_positions
+from shards import export_shards
+from frontier import CrawlFrontier
+from history import HistoryStore
+from freshness import FreshnessPolicy
+from rate_limiter import RequestScheduler
+from waits import Waiter
+from selector_registry import SelectorRegistry
+from instrumentation import Tracer, traced
+from profile_parser import parse_profile_header, convert_count_to_number
+from sinks import NDJSONSink
+from delta import END_OF_LIST, KNOWN_RUN, INTERRUPTED
+from pipeline import PersistPipeline, ResultWriter, is_valid_username, FRESH, COUNTS, COUNTS_ONLY, DELTA, FULL
+
+logger = logging.getLogger(__name__)
+
+# Resources lean mode never downloads: only the HTML and scripts carry the
+# profile header and the connection lists
+LEAN_BLOCKED_URLS = [
+    '*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.heic*', '*.svg*', '*.ico*',
+    '*.mp4*', '*.m4a*', '*.m4v*', '*.webm*',
+    '*.woff*', '*.ttf*', '*.otf*',
+]
+
+# Collects link hrefs inside a dialog in one round trip. The first call scans
+# the dialog and installs a MutationObserver; later calls only drain the hrefs
+# of links added since the previous call, so the cost per scroll stays flat
+# however long the list gets.
+EXTRACT_NEW_HREFS_SCRIPT = """
+const dialog = arguments[0];
+let state = dialog.__igExtractState;
+if (!state) {
+    state = {pending: [], seen: new Set()};
+    const collect = (node) => {
+        if (node.nodeType !== Node.ELEMENT_NODE) return;
+        const links = node.matches("a[role='link']") ? [node] : node.querySelectorAll("a[role='link']");
+        for (const link of links) {
+            const href = link.href;
+            if (href && !state.seen.has(href)) {
+                state.seen.add(href);
+                state.pending.push(href);
+            }
+        }
+    };
+    collect(dialog);
+    state.observer = new MutationObserver((mutations) => {
+        for (const mutation of mutations) {
+            mutation.addedNodes.forEach(collect);
+        }
+    });
+    state.observer.observe(dialog, {childList: true, subtree: true});
+    dialog.__igExtractState = state;
+}
+const batch = state.pending;
+state.pending = [];
+return batch;
+"""
 
 class InstagramScraper:
-    def __init__(self):
+    def __init__(self, store: SQLiteStore = None, driver=None, lean: bool = False, headless: bool = False):
         load_dotenv()
         self.username = os.getenv('INSTAGRAM_USERNAME')
         self.password = os.getenv('INSTAGRAM_PASSWORD')
         self.base_url = 'https://www.instagram.com'
         self.celebrity_threshold = 3000
-        self.setup_driver()
+        self.trace_path = 'data/trace.jsonl'  # Per-span timings, one JSON object per line
+        self.tracer = Tracer(self.trace_path)
+        self.selectors_path = 'data/selectors.json'  # Selectors that matched on the last run
+        # Headless, without images, media or fonts
+        self.lean = lean
+        self.headless = headless or lean
+        self.page_stats = {'pages': 0, 'bytes': 0}
+        self.current_page: Optional[dict] = None  # URL and load time of the page the browser is on
+        self.setup_driver(driver)
         self.processed_users: Set[str] = set()
         self.celebrity_users: Set[str] = set()
         self.user_data: Dict[str, dict] = {}
+
+        # Storage: scraped users go to the store, user_data.json is an export of it
+        self.data_path = 'public/user_data.json'
+        self.graph_path = 'public/graph.json'  # Compact graph loaded by the frontend
+        self.index_path = 'public/index.json'  # Username -> shard index for lazy loading
+        self.shards_path = 'public/shards'
+        self.export_files = True  # Write the files above at the end of a run
+        self.sink: Optional[NDJSONSink] = None  # Streams every written user while crawling
+        self.session_path = 'data/session.json'  # Saved login cookies
+        self.store = store if store is not None else SQLiteStore()
+        if self.store.user_count() == 0:
+            imported = self.store.import_json(self.data_path)
+            if imported:
+                logger.info(f"Imported {imported} users from {self.data_path}")
+
+        # Persistent crawl queue so an interrupted run can resume
+        self.max_attempts = 3  # Attempts per user before giving up on them
+        self.frontier = CrawlFrontier(self.store, max_attempts=self.max_attempts,
+                                      celebrity_threshold=self.celebrity_threshold)
+
+        # Every change to a scraped list, for looking back at earlier states of the network
+        self.history = HistoryStore(self.store)
+
+        # Stored users younger than these TTLs are served from the store
+        self.freshness = FreshnessPolicy(counts_ttl=timedelta(days=1), connections_ttl=timedelta(days=7))
+        # Refreshing a stored list stops scrolling after this many known usernames in a row
+        self.delta_stop_after_known = 20
+
+        # Writes results straight away when not running through the background pipeline
+        self.writer = ResultWriter(self.store, None, self.history, self.celebrity_threshold)
         
         # Rate limiting parameters
         self.requests_per_hour = 150  # Maximum requests per hour
         self.min_delay = 2  # Minimum delay between requests in seconds
-        self.max_delay = 4  # Maximum delay between requests in seconds
         self.batch_size = 25  # Number of users to process before taking a longer break
+        self.batch_cooldown = 60  # Length of that break in seconds
+        # Pacing floors per phase: waits return as soon as the page is ready, but not before these
+        self.phase_minimums = {'login': 1.0, 'dialog': 0.5, 'scroll': 0.5}
+
+        # Every navigation and dialog open waits on this scheduler
+        self.scheduler = RequestScheduler(self.requests_per_hour, self.batch_size, self.batch_cooldown)
+
+        # Background writer: results per transaction, and results the browser may be ahead by
+        self.persist_batch_size = 20
+        self.persist_queue_size = 100
+
+    def setup_driver(self, driver=None):
+        if driver is not None:
+            # Use an already configured driver (e.g. the benchmark's headless one)
+            self.driver = driver
+            self.tracer.attach(self.driver)
+            self.wait = WebDriverWait(self.driver, 10)
+            self.waiter = Waiter(self.driver, timeout=10)
+            self.selectors = SelectorRegistry(self.driver, self.waiter, self.selectors_path)
+            return
 
-    def setup_driver(self):
         chrome_options = Options()
-        # chrome_options.add_argument('--headless')  # Uncomment to run headless
+        if self.headless:
+            chrome_options.add_argument('--headless=new')
+        if self.lean:
+            chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+            chrome_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
         chrome_options.add_argument('--no-sandbox')
         chrome_options.add_argument('--disable-dev-shm-usage')
         chrome_options.add_argument('--window-size=1920,1080')
+        # DevTools network events in the performance log, for the bytes per page
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        chrome_options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
         
         self.driver = webdriver.Chrome(options=chrome_options)
+        if self.lean:
+            # Images are off through prefs; media and fonts have no pref, so block them by URL
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': LEAN_BLOCKED_URLS})
+        self.tracer.attach(self.driver)
         self.wait = WebDriverWait(self.driver, 10)
+        self.waiter = Waiter(self.driver, timeout=10)
+        self.selectors = SelectorRegistry(self.driver, self.waiter, self.selectors_path)
 
+    @traced()
     def login(self):
         try:
-            print("Logging in...")
-            self.driver.get(self.base_url)
-            time.sleep(2)  # Wait for page to load completely
-
-            # Try to find the username input field with different selectors
-            username_input = None
-            for selector in ['input[name="username"]', 'input[aria-label="Phone number, username, or email"]']:
-                try:
-                    username_input = self.wait.until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                    )
-                    if username_input:
-                        break
-                except:
-                    continue
+            logger.info("Logging in...")
+            self.navigate(self.base_url)
 
+            # Each lookup tests all known selectors for the field at once
+            username_input = self.selectors.find('login_username')
             if not username_input:
                 raise Exception("Could not find username input field")
 
-            # Try to find the password input field with different selectors
-            password_input = None
-            for selector in ['input[name="password"]', 'input[aria-label="Password"]']:
-                try:
-                    password_input = self.wait.until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                    )
-                    if password_input:
-                        break
-                except:
-                    continue
-
+            password_input = self.selectors.find('login_password')
             if not password_input:
                 raise Exception("Could not find password input field")
 
             # Enter credentials
             username_input.clear()
             username_input.send_keys(self.username)
-            time.sleep(1)
             password_input.clear()
             password_input.send_keys(self.password)
-            time.sleep(1)
-
-            # Try to find the login button with different selectors
-            login_button = None
-            for selector in [
-                'button[type="submit"]',
-                'button:contains("Log in")',
-                'button:contains("Sign in")'
-            ]:
-                try:
-                    login_button = self.wait.until(
-                        EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
-                    )
-                    if login_button:
-                        break
-                except:
-                    continue
 
+            login_button = self.selectors.find('login_button')
             if not login_button:
                 raise Exception("Could not find login button")
 
             # Click login
             login_button.click()
-            time.sleep(7)
 
+            # Logged in once the session cookie is set and the login form is gone
+            logged_in = self.waiter.until(
+                lambda: any(c['name'] == 'sessionid' for c in self.driver.get_cookies())
+                and not self.driver.find_elements(By.CSS_SELECTOR, 'input[name="password"]'),
+                timeout=15,
+                minimum=self.phase_minimums['login']
+            )
+            if not logged_in:
+                raise Exception("Login did not complete")
 
-            print("Login successful")
+            logger.info("Login successful")
+            self.save_session()
 
         except Exception as e:
-            print(f"Login failed: {str(e)}")
+            logger.error(f"Login failed: {e}")
             raise
 
-    def random_delay(self, min_delay: float = None, max_delay: float = None):
-        """Add a random delay between operations to appear more human-like"""
-        min_d = min_delay if min_delay is not None else self.min_delay
-        max_d = max_delay if max_delay is not None else self.max_delay
-        delay = random.uniform(min_d, max_d)
-        time.sleep(delay)
-    
+    def save_session(self):
+        """Save the session cookies so later runs can skip the login flow"""
+        try:
+            write_json_atomic(self.session_path, self.driver.get_cookies())
+            logger.info(f"Saved session to {self.session_path}")
+        except Exception as e:
+            logger.warning(f"Could not save session: {e}")
+
+    def restore_session(self) -> bool:
+        """Load saved cookies and check that they are still logged in.
+        Returns:
+            bool: True if the restored session is valid
+        """
+        try:
+            with open(self.session_path, 'r') as f:
+                cookies = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+
+        try:
+            # Set cookies through DevTools so no page has to be loaded first
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            for cookie in cookies:
+                params = {k: v for k, v in cookie.items() if k in ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite')}
+                if 'expiry' in cookie:
+                    params['expires'] = cookie['expiry']
+                self.driver.execute_cdp_cmd('Network.setCookie', params)
+
+            # One page load: logged in if the session cookie survived and no login form is shown
+            self.navigate(self.base_url)
+            has_session = any(c['name'] == 'sessionid' for c in self.driver.get_cookies())
+            has_login_form = self.driver.execute_script(
+                "return !!document.querySelector('input[name=\"username\"]')"
+            )
+            if has_session and not has_login_form:
+                logger.info("Restored saved session")
+                return True
+        except Exception as e:
+            logger.warning(f"Could not restore session: {e}")
 
+        logger.info("Saved session is no longer valid")
+        try:
+            self.driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        except Exception as e:
+            logger.warning(f"Could not clear restored cookies: {e}")
+        return False
+
+    def ensure_logged_in(self):
+        """Reuse the saved session if it is still valid, otherwise log in"""
+        if not self.restore_session():
+            self.login()
+
+    @traced()
+    def navigate(self, url: str):
+        """Load a page once the request scheduler allows it"""
+        self.scheduler.acquire('navigation')
+        self.finish_page()
+        self.current_page = {'url': url, 'start': time.time()}
+        with self.tracer.span('page_load', url=url):
+            self.driver.get(url)
+
+    def received_bytes(self) -> int:
+        """Bytes received over the network since the last call.
+
+        Sums encodedDataLength of the Network.loadingFinished events in
+        Chrome's performance log, which covers the document, its
+        subresources and every XHR/GraphQL request made afterwards (profile
+        data, dialog pages). Reading the log also empties it. 0 if the
+        driver has no performance log, e.g. a driver passed in without it.
+        """
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception:
+            return 0
+        total = 0
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            if message.get('method') == 'Network.loadingFinished':
+                total += int(message['params'].get('encodedDataLength', 0))
+        return total
+
+    def finish_page(self):
+        """Attribute everything received since the current page was loaded to it"""
+        if self.current_page is None:
+            return
+        page, self.current_page = self.current_page, None
+        page_bytes = self.received_bytes()
+        self.page_stats['pages'] += 1
+        self.page_stats['bytes'] += page_bytes
+        self.tracer.record('page', page['start'], time.time() - page['start'], 0,
+                           attrs={'url': page['url'], 'bytes': page_bytes})
+        logger.debug(f"Left {page['url']} ({page_bytes / 1024:.1f} KB)")
+
+    def report_transfer(self):
+        """Log the bytes transferred per page so far"""
+        self.finish_page()
+        pages, total = self.page_stats['pages'], self.page_stats['bytes']
+        if pages:
+            logger.info(f"Transferred {total / 1024 / 1024:.1f} MB over {pages} pages "
+                        f"({total / pages / 1024:.1f} KB per page)")
+
+    @traced()
     def handle_rate_limit_popup(self) -> bool:
         """Handle Instagram's rate limit popup if it appears.
         Returns:
@@ -138,7 +336,7 @@ class InstagramScraper:
             )
             
             if popup and any("Try Again Later" in p.text for p in popup):
-                print("Rate limit popup detected. Looking for OK button...")
+                logger.warning("Rate limit popup detected. Looking for OK button...")
                 
                 try:
                     # Look specifically for the OK button
@@ -148,47 +346,53 @@ class InstagramScraper:
                             "//button[text()='OK']"
                         ))
                     )
-                    print("Found OK button, clicking it...")
+                    logger.debug("Found OK button, clicking it...")
                     ok_button.click()
-                    self.random_delay()
+                    self.wait_for_popup_dismissed()
                 except Exception as e:
-                    print(f"Error clicking OK button: {str(e)}")
+                    logger.error(f"Error clicking OK button: {e}")
                     try:
                         webdriver.ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
-                        self.random_delay()
+                        self.wait_for_popup_dismissed()
                     except:
-                        print("Could not dismiss popup with Escape key")
+                        logger.warning("Could not dismiss popup with Escape key")
                     return True
                 return False
             return False
         except Exception as e:
-            print(f"Error checking for rate limit popup: {str(e)}")
+            logger.error(f"Error checking for rate limit popup: {e}")
             return True
 
-    def scroll_to_load_all(self, dialog) -> List[str]:
-        """Scroll through the followers/following dialog and extract all usernames"""
+    def wait_for_popup_dismissed(self):
+        """Wait until the rate limit popup is gone"""
+        self.waiter.for_script(
+            "return !Array.from(document.querySelectorAll('h3.x1lliihq.x1plvlek.xryxfnj.x1n2onr6'))"
+            ".some(h => h.textContent.includes('Try Again Later'))",
+            minimum=self.min_delay
+        )
+
+    @traced()
+    def scroll_to_load_all(self, dialog, known: Set[str] = None, stop_after_known: int = 0) -> Tuple[List[str], str]:
+        """Scroll through the followers/following dialog and extract all usernames.
+
+        With known usernames (the stored list) and stop_after_known, scrolling
+        stops once that many known usernames have appeared in a row: the
+        dialog lists newest first, so everything below is already stored.
+        Returns:
+            (usernames, stopped): stopped says why scrolling ended, END_OF_LIST,
+            KNOWN_RUN or INTERRUPTED (rate limit popup, error) when the list
+            is only a prefix
+        """
+        # Dict keeps the order usernames appear in the dialog
+        usernames: Dict[str, None] = {}
         try:
-            usernames = set()
-            print("Scrolling through list...")
-            # Try both possible selectors for the scrollable container
-            scrollable = None
-            selectors = [
-                ".xyi19xy.x1ccrb07.xtf3nb5.x1pc53ja.x1lliihq.x1iyjqo2.xs83m0k.xz65tgg.x1rife3k.x1n2onr6",
-                ".x9f619.xjbqb8w.x78zum5.x168nmei.x13lgxp2.x5pf9jr.xo71vjh.x1n2onr6.x6ikm8r.x1rife3k.x1iyjqo2.x2lwn1j.xeuugli.xdt5ytf.xqjyukv.x1qjc9v5.x1oa3qoh.x1nhvcw1"
-            ]
-            
-            for selector in selectors:
-                try:
-                    scrollable = dialog.find_element(By.CSS_SELECTOR, selector)
-                    if scrollable:
-                        print(f"Found scrollable container with selector: {selector}")
-                        break
-                except:
-                    continue
-            
+            known_run = 0
+            logger.debug("Scrolling through list...")
+            # The dialog list is already there, so don't wait long for its container
+            scrollable = self.selectors.find('dialog_scrollable', root=dialog, timeout=2)
             if not scrollable:
-                print("Could not find scrollable container")
-                return []
+                logger.warning("Could not find scrollable container")
+                return [], INTERRUPTED
 
             retries = 0
             last_height = 0
@@ -198,21 +402,32 @@ class InstagramScraper:
             while retries < max_scroll_attempts:
                 # Check for rate limit popup before each scroll
                 if self.handle_rate_limit_popup():
-                    break
+                    logger.warning("Rate limited while scrolling, keeping the %d usernames read so far", len(usernames))
+                    return list(usernames), INTERRUPTED
                 
                 # Get current scroll position
-                current_height = self.driver.execute_script("return arguments[0].scrollTop", scrollable)
-                scroll_height = self.driver.execute_script("return arguments[0].scrollHeight", scrollable)
+                current_height, scroll_height = self.driver.execute_script(
+                    "return [arguments[0].scrollTop, arguments[0].scrollHeight]", scrollable
+                )
                 
-                # Extract usernames from current view
-                usernames.update(self.extract_usernames(dialog))
+                # Extract usernames added since the last scroll
+                batch = self.extract_usernames(dialog)
+                usernames.update(dict.fromkeys(batch))
+                logger.debug("Found %d unique usernames so far...", len(usernames))
+
+                if known and stop_after_known:
+                    for username in batch:
+                        known_run = known_run + 1 if username in known else 0
+                    if known_run >= stop_after_known:
+                        logger.debug("Reached %d known usernames in a row, stopping", known_run)
+                        return list(usernames), KNOWN_RUN
                 
                 # If we haven't moved or we're at the bottom
                 if current_height == last_height or current_height + 1000 >= scroll_height:
                     retries += 1
                     if retries >= max_scroll_attempts:
-                        print("Reached the bottom or no more content")
-                        break
+                        logger.debug("Reached the bottom or no more content")
+                        return list(usernames), END_OF_LIST
                 else:
                     retries = 0
                 
@@ -225,147 +440,80 @@ class InstagramScraper:
                     new_position
                 )
                 
-                # Random delay between scrolls
-                self.random_delay(0.5, 1.5)
+                # Wait for the list to finish loading the next page of entries
+                self.waiter.for_stable_height(scrollable, timeout=3, minimum=self.phase_minimums['scroll'])
                 
                 last_height = current_height
                 
-            return list(usernames)
+            return list(usernames), END_OF_LIST
                 
         except Exception as e:
-            print(f"Error while scrolling: {str(e)}")
-            return list(usernames)  # Return what we've collected so far
+            logger.error(f"Error while scrolling: {e}")
+            return list(usernames), INTERRUPTED  # Return what we've collected so far
 
     def extract_usernames(self, dialog) -> List[str]:
+        """Return usernames linked in the dialog that were not returned by a previous call.
+
+        These are raw: validation happens when the results are written.
+        """
         try:
-            all_usernames = set()
-            links = dialog.find_elements(By.CSS_SELECTOR, "a[role='link']")
-            for link in links:
-                try:
-                    href = link.get_attribute('href')
-                    if href and 'instagram.com' in href:
-                        username = href.split('instagram.com/')[-1].strip('/')
-                        if self.is_valid_username(username):
-                            all_usernames.add(username)
-                except:
-                    continue
-            print(f"Found {len(all_usernames)} unique usernames so far...")
-            return list(all_usernames)
+            new_usernames = {}
+            for href in self.driver.execute_script(EXTRACT_NEW_HREFS_SCRIPT, dialog):
+                if href and 'instagram.com' in href:
+                    new_usernames[href.split('instagram.com/')[-1].strip('/')] = None
+            return list(new_usernames)
         except Exception as e:
-            print(f"Error extracting usernames: {str(e)}")
+            logger.error(f"Error extracting usernames: {e}")
             return []
     
     def is_valid_username(self, text):
         """Helper function to validate usernames"""
-        if not text:
-            return False
-            
-        # Skip common non-username texts
-        if text.startswith(('Follow', 'Following', 'Remove', '#', '@')):
-            return False
-            
-        # Skip if contains spaces or newlines
-        if ' ' in text or '\n' in text:
-            return False
-            
-        # Skip common button texts
-        if text.lower() in ['follow', 'following', 'remove', 'verified']:
-            return False
-            
-        # Skip if too long or too short
-        if len(text) < 2 or len(text) > 30:
-            return False
-            
-        # Skip if contains invalid characters
-        valid_chars = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._')
-        if not all(c in valid_chars for c in text):
-            return False
-            
-        # Skip common non-username paths
-        if text in ['explore', 'direct', 'p', 'reels', 'stories', 'tags', 'locations']:
-            return False
-            
-        return True
+        return is_valid_username(text)
 
     def convert_count_to_number(self, count_text: str) -> int:
         """Convert Instagram count format (e.g., '61.2k', '1.2M') to number"""
-        try:
-            # Remove commas and convert to lowercase
-            count_text = count_text.replace(',', '').lower().strip()
-            
-            # Handle 'k' thousands
-            if 'k' in count_text:
-                number = float(count_text.replace('k', ''))
-                return int(number * 1000)
-            
-            # Handle 'M' millions
-            if 'm' in count_text:
-                number = float(count_text.replace('m', ''))
-                return int(number * 1000000)
-            
-            # Handle regular numbers
-            return int(count_text.split()[0])
-        except Exception as e:
-            print(f"Error converting count '{count_text}': {str(e)}")
-            return 0
+        return convert_count_to_number(count_text)
 
-    def get_connection_count(self, target_username: str, connection_type: str) -> int:
-        """Get either followers or following count for a user.
-        Args:
-            target_username: The username to get count for
-            connection_type: Either 'followers' or 'following'
+    @traced()
+    def get_profile(self, target_username: str) -> dict:
+        """Read the whole profile header (name, counts, private flag) from one page snapshot.
         Returns:
-            Count of connections
+            Dict with profile_name, followers_count, following_count and is_private
+        Raises:
+            Exception: If the page shows no counts at all, e.g. a login wall
         """
-        try:
-            # Navigate to profile if not already there
-            if not self.driver.current_url.endswith(f'/{target_username}/'):
-                self.driver.get(f'{self.base_url}/{target_username}/')
-                time.sleep(2)
-
-            # Find the count element
-            count_link = self.wait.until(
-                EC.presence_of_element_located((By.XPATH, f"//a[contains(@href, '/{connection_type}')]"))
-            )
-            count_text = count_link.text.strip()
-            
-            return self.convert_count_to_number(count_text)
+        html = self.driver.execute_script(
+            "return (document.querySelector('main') || document.body).outerHTML"
+        )
+        header = parse_profile_header(html)
+        if not header['followers_text'] and not header['following_text']:
+            raise Exception(f"No follower/following counts found on profile of {target_username}")
+        return {
+            'profile_name': header['profile_name'],
+            'followers_count': self.convert_count_to_number(header['followers_text']) if header['followers_text'] else 0,
+            'following_count': self.convert_count_to_number(header['following_text']) if header['following_text'] else 0,
+            'is_private': header['is_private'],
+        }
 
-        except Exception as e:
-            print(f"Error getting {connection_type} count for {target_username}: {str(e)}")
-            return 0
+    @traced()
+    def get_user_connections(self, target_username: str, connection_type: str,
+                             known: List[str] = None) -> Tuple[List[str], str]:
+        """Get either followers or following list for a user.
 
-    def get_profile_name(self, target_username: str) -> str:
-        """Get the user's display name from their profile."""
-        try:
-            # Wait for the profile header to load
-            header = self.wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "header section"))
-            )
-            
-            # Try to find the name element
-            try:
-                name_element = header.find_element(By.CSS_SELECTOR, "span.x1lliihq")
-                return name_element.text.strip()
-            except:
-                return ""  # Return empty string if name not found
-                
-        except Exception as e:
-            print(f"Error getting profile name for {target_username}: {str(e)}")
-            return ""
-
-    def get_user_connections(self, target_username: str, connection_type: str) -> List[str]:
-        """Get either followers or following list for a user."""
+        With the stored list as known, only the part of the list down to
+        already stored entries is returned (see scroll_to_load_all).
+        Returns:
+            (usernames, stopped) as returned by scroll_to_load_all
+        """
         max_retries = 3
         current_retry = 0
         
         while current_retry < max_retries:
             try:
-                print(f"Getting {connection_type} for {target_username}... (Attempt {current_retry + 1}/{max_retries})")
+                logger.info(f"Getting {connection_type} for {target_username}... (Attempt {current_retry + 1}/{max_retries})")
                 
                 if not self.driver.current_url.endswith(f'/{target_username}/'):
-                    self.driver.get(f'{self.base_url}/{target_username}/')
-                self.random_delay()
+                    self.navigate(f'{self.base_url}/{target_username}/')
 
                 # Check for rate limit popup after navigation
                 if self.handle_rate_limit_popup():
@@ -377,10 +525,11 @@ class InstagramScraper:
                     EC.element_to_be_clickable((By.XPATH, f"//a[contains(@href, '/{connection_type}')]"))
                 )
                 connection_count = connection_link.text
-                print(f"Found {connection_count}")
+                logger.debug(f"Found {connection_count}")
                 
+                self.scheduler.acquire('dialog')
                 connection_link.click()
-                self.random_delay()
+                self.waiter.for_script("return !!document.querySelector(\"div[role='dialog']\")")
 
                 # Check for rate limit popup after clicking
                 if self.handle_rate_limit_popup():
@@ -391,24 +540,27 @@ class InstagramScraper:
                     EC.presence_of_element_located((By.CSS_SELECTOR, "div[role='dialog']"))
                 )
                 
-                self.random_delay()
+                self.waiter.for_dialog_list(connection_dialog, minimum=self.phase_minimums['dialog'])
                 
                 # Check for rate limit popup before scrolling
                 if self.handle_rate_limit_popup():
                     current_retry += 1
                     continue
                 
-                usernames = self.scroll_to_load_all(connection_dialog)
+                if known:
+                    usernames, stopped = self.scroll_to_load_all(connection_dialog, set(known), self.delta_stop_after_known)
+                else:
+                    usernames, stopped = self.scroll_to_load_all(connection_dialog)
 
-                print(f"Found {len(usernames)} {connection_type}")
+                logger.info(f"Found {len(usernames)} {connection_type}" + (" (incomplete)" if stopped == INTERRUPTED else ""))
                 
                 webdriver.ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
-                self.random_delay()
+                self.waiter.for_dialog_closed(minimum=self.phase_minimums['dialog'])
                 
-                return usernames
+                return usernames, stopped
 
             except Exception as e:
-                print(f"Error getting {connection_type} (Attempt {current_retry + 1}): {str(e)}")
+                logger.error(f"Error getting {connection_type} (Attempt {current_retry + 1}): {e}")
                 # Check if it's a rate limit popup
                 if self.handle_rate_limit_popup():
                     current_retry += 1
@@ -416,123 +568,280 @@ class InstagramScraper:
                 # If it's another error, increment retry counter
                 current_retry += 1
                 if current_retry < max_retries:
-                    print("Retrying after error...")
+                    logger.warning("Retrying after error...")
                 
-        print(f"Failed to get {connection_type} after {max_retries} attempts")
-        return []
+        logger.error(f"Failed to get {connection_type} after {max_retries} attempts")
+        return [], INTERRUPTED
 
-    def process_user(self, target_username: str, skip_followers: bool = False, skip_following: bool = False) -> Tuple[List[str], List[str], bool]:
-        """Process a single user and return their followers and following lists"""
-        print(f"\nProcessing user: {target_username}")
+    @traced()
+    def fetch_user(self, target_username: str) -> dict:
+        """Browser stage: read a user's profile and lists without writing anything.
+        Returns:
+            A result for pipeline.ResultWriter
+        Raises:
+            Whatever stopped the profile from being read, so the caller can record it
+        """
+        logger.info(f"Processing user: {target_username}")
+
+        # Serve fresh records from the store instead of loading the profile
+        counts_updated, connections_updated = self.store.get_timestamps(target_username)
+        counts_fresh = self.freshness.counts_fresh(counts_updated)
+        connections_fresh = self.freshness.connections_fresh(connections_updated)
+        stored = self.store.get_user(target_username)
+        if stored is not None and connections_fresh and counts_fresh:
+            logger.info(f"User {target_username} is fresh (updated {stored['last_updated']}), using stored data...")
+            return {'username': target_username, 'mode': FRESH}
+        
+        # Navigate to user's profile
+        self.navigate(f'{self.base_url}/{target_username}/')
+        if not self.waiter.for_profile_header():
+            # Login wall, missing page or rate limit: nothing on it is this user's data
+            raise Exception(f"Profile of {target_username} did not load")
         
+        # Profile name and both counts from a single snapshot
+        profile = self.get_profile(target_username)
+        result = {'username': target_username, 'profile': profile}
+        
+        # Check if user is a celebrity
+        if profile['followers_count'] > self.celebrity_threshold:
+            logger.info(f"User {target_username} is a celebrity ({profile['followers_count']} followers), saving counts only...")
+            self.celebrity_users.add(target_username)
+            result['mode'] = COUNTS
+        elif profile['is_private']:
+            # The dialogs can't be opened, don't spend retries on them
+            logger.info(f"User {target_username} is private, saving counts only...")
+            result['mode'] = COUNTS
+        elif stored is not None and connections_fresh:
+            # Only the counts were stale, keep the stored lists
+            logger.info(f"Connections for {target_username} are fresh, refreshing counts only...")
+            result['mode'] = COUNTS_ONLY
+        elif stored is not None and (stored['followers'] or stored['following']):
+            # Stale lists: scroll only down to entries that are already stored
+            result['mode'] = DELTA
+            result['stopped'] = {}
+            for kind in ('followers', 'following'):
+                result[kind], result['stopped'][kind] = self.get_user_connections(
+                    target_username, kind, known=stored[kind]
+                )
+        else:
+            # Get followers and following for non-celebrity users
+            result['mode'] = FULL
+            result['stopped'] = {}
+            for kind in ('followers', 'following'):
+                result[kind], result['stopped'][kind] = self.get_user_connections(target_username, kind)
+                if result['stopped'][kind] == INTERRUPTED:
+                    # A prefix would be saved as the whole list, leave the user to be retried
+                    raise Exception(f"Could not read all {kind} of {target_username}")
+        
+        return result
+
+    @traced()
+    def process_user(self, target_username: str, skip_followers: bool = False, skip_following: bool = False) -> Tuple[List[str], List[str], bool]:
+        """Process a single user and return their followers and following lists.
+
+        Reads the user and writes the result straight away; run() instead
+        hands results to the background pipeline. skip_followers/skip_following
+        are kept for compatibility only: both counts now come from the same
+        page snapshot, so there is nothing to skip.
+        """
         if target_username in self.processed_users:
-            print(f"User {target_username} already processed, skipping...")
+            logger.debug(f"User {target_username} already processed, skipping...")
             return [], [], False
-            
         self.processed_users.add(target_username)
-        
+
         try:
-            # Navigate to user's profile
-            self.driver.get(f'{self.base_url}/{target_username}/')
-            time.sleep(0.5)
-            
-            # Get profile name
-            profile_name = self.get_profile_name(target_username)
-            
-            # Get follower and following counts
-            if not skip_followers:
-                follower_count = self.get_connection_count(target_username, 'followers')
-            if not skip_following:
-                following_count = self.get_connection_count(target_username, 'following')
-            
-            # Check if user is a celebrity
-            if follower_count > self.celebrity_threshold:
-                print(f"User {target_username} is a celebrity ({follower_count} followers), saving counts only...")
-                self.celebrity_users.add(target_username)
-                followers = []
-                following = []
-            else:
-                # Get followers and following for non-celebrity users
-                followers = self.get_user_connections(target_username, 'followers')
-                following = self.get_user_connections(target_username, 'following')
-            
-            # Save data for this user
-            self.save_user_data(target_username, set(followers), set(following), follower_count, following_count, profile_name)
-            
-            return followers, following, True
-            
+            result = self.fetch_user(target_username)
+        except Exception as e:
+            logger.error(f"Error processing user {target_username}: {e}")
+            # Allow a later call to retry this user
+            self.processed_users.discard(target_username)
+            return [], [], False
+        try:
+            followers, following = self.writer.write_one(result)
         except Exception as e:
-            print(f"Error processing user {target_username}: {str(e)}")
+            logger.error(f"Error saving user {target_username}: {e}")
+            self.processed_users.discard(target_username)
             return [], [], False
+        if self.sink is not None:
+            self.sink.emit(target_username, result['mode'], self.writer.profile_of(result), followers, following)
+        return followers, following, True
 
-    def save_user_data(self, username: str, followers: set, following: set, followers_count: int, following_count: int, profile_name: str = ""):
-        """Save user data to JSON file"""
-        # Convert sets to lists for JSON serialization
-        user_data = {
-            'followers_count': followers_count,
-            'following_count': following_count,
-            'is_celebrity': len(followers) > self.celebrity_threshold,
-            'followers': list(followers),
-            'following': list(following),
-            'profile_name': profile_name,
-            'last_updated': time.strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        # Load existing data if file exists
+    @traced()
+    def export_user_data(self, root: str = None):
+        """Write the store out to user_data.json, the compact graph and the sharded index for the frontend.
+        Args:
+            root: User the frontend centres on, the first stored user if not given
+        """
+        count = self.store.export_json(self.data_path)
+        logger.info(f"Exported {count} users to {self.data_path}")
+        sizes = export_compact_graph(self.store, self.graph_path, root=root)
+        logger.info(f"Exported graph with {sizes['nodes']} nodes and {sizes['edges']} edges to {self.graph_path}")
+        # Shards carry the layout just computed for the full graph
+        positions = load_positions(self.graph_path)
+        sizes = export_shards(self.store, self.shards_path, self.index_path, positions=positions, root=root)
+        logger.info(f"Exported {sizes['users']} users in {sizes['shards']} shards to {self.shards_path}")
+
+    def refresh(self, limit: int = None):
+        """Re-scrape stored users whose connections are past their TTL, stalest first"""
         try:
-            with open('public/user_data.json', 'r') as f:
-                all_data = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            all_data = {}
-        
-        # Update data for current user
-        all_data[username] = user_data
-        
-        # Save updated data
-        os.makedirs('public', exist_ok=True)
-        with open('public/user_data.json', 'w') as f:
-            json.dump(all_data, f, indent=2)
-        
-        print(f"Updated data for {username} in user_data.json")
+            self.ensure_logged_in()
+
+            stale_users = self.store.stalest_users(self.freshness.stale_before(), limit)
+            logger.info(f"Found {len(stale_users)} stale users to refresh")
+
+            for username in stale_users:
+                try:
+                    self.process_user(username)
+                except Exception as e:
+                    logger.error(f"Error refreshing user {username}: {e}")
+                self.scheduler.finish_item()
+
+            logger.info("Refresh completed successfully!")
 
-    def run(self, skip_main_user: bool = False):
+        except Exception as e:
+            logger.error(f"Error during refresh: {e}")
+        finally:
+            try:
+                self.export_user_data()
+            except Exception as e:
+                logger.error(f"Error exporting user data: {e}")
+            self.report_transfer()
+            self.tracer.report()
+            self.tracer.close()
+            try:
+                self.driver.quit()
+            except:
+                pass
+
+    def run(self, skip_main_user: bool = False, depth: int = 1, seed: str = None) -> bool:
+        """Crawl the network around the main user.
+        Args:
+            skip_main_user: Use the main user's stored lists instead of scraping them again
+            depth: How many hops from the main user to crawl; 1 is their
+                followers and following, 2 adds those users' connections, and so on
+            seed: User to start from instead of the logged in account
+        Returns:
+            True if the crawl worked through the frontier and the export (if
+            any) was written; False if login, the main user, the persist
+            pipeline or the export failed. Single users that failed are
+            retried by later runs and do not make the crawl fail.
+        """
+        root = seed or self.username
+        completed = False
+        # Writes results in the background so the browser never waits on the disk
+        pipeline = PersistPipeline(self.store.path, depth, self.celebrity_threshold, self.max_attempts,
+                                   self.persist_batch_size, self.persist_queue_size, self.sink)
         try:
-            self.login()
+            self.ensure_logged_in()
+
+            # Requeue anything a previous run left half done
+            recovered = self.frontier.recover()
+            if recovered:
+                logger.info(f"Requeued {recovered} users left in progress by the last run")
+            # Depths count from this run's root, even if an earlier crawl found it further out
+            self.frontier.set_root(root)
             
-            if not skip_main_user:
+            if not skip_main_user and not self.frontier.is_done(root):
                 # Process main user first
-                main_followers, main_following, _ = self.process_user(self.username)
+                self.frontier.mark_in_progress(root)
+                main_followers, main_following, success = self.process_user(root)
+                if not success:
+                    self.frontier.mark_failed(root)
+                    raise Exception(f"Could not process main user {root}")
             else:
-                # Read from user_data 
-                with open('public/user_data.json', 'r') as f:
-                    user_data = json.load(f)
-                main_followers = user_data[self.username]['followers']
-                main_following = user_data[self.username]['following']
+                # Read the main user's lists from the store
+                main_user = self.store.get_user(root)
+                if main_user is None:
+                    raise Exception(f"No stored data for {root}, run without skip_main_user first")
+                main_followers = main_user['followers']
+                main_following = main_user['following']
                 
-            # Combine followers and following lists
-            users_to_process = set(main_followers + main_following)
-            print(f"\nFound {len(users_to_process)} users to process")
+            # Queue followers and following; users already in the frontier keep their status
+            queued = self.frontier.complete(root, main_followers + main_following, depth)
+            # Users finished by earlier runs with a smaller depth reach further now
+            queued += self.frontier.expand(depth)
+            logger.info(f"Queued {queued} new users, frontier status: {self.frontier.counts()}")
             
-            # Process users in batches
-            users_list = list(users_to_process)
-            for username in users_list:
+            # Work through the frontier until nothing is pending or retryable. The
+            # pipeline marks users done and queues their connections until depth is reached
+            pipeline.start()
+            while True:
+                if not pipeline.thread.is_alive():
+                    raise Exception("Persist pipeline stopped, nothing read now could be saved")
+                username = self.frontier.next_user()
+                if username is None:
+                    # Results still being written may queue more users
+                    pipeline.drain()
+                    username = self.frontier.next_user()
+                    if username is None:
+                        break
+                # The frontier is the only record of who was crawled: a user the
+                # writer failed to save is failed there and read again on retry
                 try:
-                    print(f"\nProcessing user: {username}")
-                    self.process_user(username, skip_followers=True)
-                    self.random_delay()
+                    self.frontier.mark_in_progress(username)
+                    pipeline.submit(self.fetch_user(username))
                 except Exception as e:
-                    print(f"Error processing user {username}: {str(e)}")
-            
-            print("\nNetwork data collection completed successfully!")
+                    logger.error(f"Error processing user {username}: {e}")
+                    self.frontier.mark_failed(username, str(e))
+                self.scheduler.finish_item()
+
+            pipeline.close()
+            completed = True
+            logger.info(f"Network data collection completed successfully! Frontier status: {self.frontier.counts()}")
+            logger.info(f"Request scheduler: {self.scheduler.stats()}")
             
         except Exception as e:
-            print(f"Error during network collection: {str(e)}")
+            logger.error(f"Error during network collection: {e}")
         finally:
+            # Flush what the browser already read before exporting
+            pipeline.close()
+            logger.info(f"Persist pipeline wrote {pipeline.written} users, {pipeline.failed} failed")
+            try:
+                if self.export_files:
+                    self.export_user_data(root)
+            except Exception as e:
+                logger.error(f"Error exporting user data: {e}")
+                completed = False
+            self.report_transfer()
+            self.tracer.report()
+            self.tracer.close()
             try:
                 self.driver.quit()
             except:
                 pass
+        return completed
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Crawl the Instagram network around a user')
+    parser.add_argument('--seed', help='User to start from (default: the INSTAGRAM_USERNAME account)')
+    parser.add_argument('--depth', type=int, default=1, help='Hops from the seed to crawl')
+    parser.add_argument('--format', choices=['json', 'ndjson'], default='json',
+                        help='json writes the public/ files at the end, ndjson streams users and edges while crawling')
+    parser.add_argument('--output', default='-', help='NDJSON destination, - for stdout')
+    parser.add_argument('--store', default='data/user_data.db', help='Path to the SQLite store')
+    parser.add_argument('--skip-seed', action='store_true', help="Use the seed's stored lists instead of scraping it")
+    parser.add_argument('--headless', action='store_true', help='Run Chrome without a window')
+    parser.add_argument('--lean', action='store_true', help='Headless, without images, media or fonts')
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args(argv)
+    # Logs go to stderr so stdout carries nothing but NDJSON
+    logging.basicConfig(level=args.log_level.upper(), stream=sys.stderr,
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    scraper = InstagramScraper(store=SQLiteStore(args.store), lean=args.lean, headless=args.headless)
+    output = None
+    if args.format == 'ndjson':
+        output = sys.stdout if args.output == '-' else open(args.output, 'w')
+        scraper.sink = NDJSONSink(output)
+        scraper.export_files = False
+    try:
+        completed = scraper.run(args.skip_seed, args.depth, args.seed)
+    finally:
+        if output is not None and output is not sys.stdout:
+            output.close()
+    # A failed crawl must not look like an empty one to whoever reads the output
+    return 0 if completed else 1
+
 
 if __name__ == "__main__":
-    scraper = InstagramScraper()
-    scraper.run(True) 
\ No newline at end of file
+    sys.exit(main()) 
\ No newline at end of file
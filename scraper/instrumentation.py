@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import logging
+import functools
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CommandCounter:
+    """Counts WebDriver commands (round trips) issued through a driver.
+
+    Every WebDriver and WebElement call funnels through driver.execute, so
+    wrapping that one method catches them all.
+    """
+
+    def __init__(self, driver):
+        self.count = 0
+        execute = driver.execute
+
+        def counting_execute(*args, **kwargs):
+            self.count += 1
+            return execute(*args, **kwargs)
+
+        driver.execute = counting_execute
+
+
+class Tracer:
+    """Times named spans of the scrape pipeline.
+
+    Each finished span is appended to a JSONL trace file with its duration and
+    the number of WebDriver commands issued inside it, and aggregated per name
+    for the summary printed at the end of a run.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.file = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.file = open(path, 'a')
+        self.counter: Optional[CommandCounter] = None
+        self.totals: Dict[str, dict] = {}
+        self.depth = 0
+
+    def attach(self, driver) -> None:
+        """Start counting the WebDriver commands issued through driver."""
+        self.counter = CommandCounter(driver)
+
+    @property
+    def commands(self) -> int:
+        return self.counter.count if self.counter else 0
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time the body; it can add attributes to the event through the yielded dict."""
+        start_time = time.time()
+        start = time.perf_counter()
+        commands = self.commands
+        self.depth += 1
+        error = None
+        try:
+            yield attrs
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.depth -= 1
+            duration = time.perf_counter() - start
+            self.record(name, start_time, duration, self.commands - commands, error, attrs)
+
+    def record(self, name: str, start_time: float, duration: float, commands: int,
+               error: Optional[str] = None, attrs: dict = None) -> None:
+        totals = self.totals.setdefault(name, {'count': 0, 'total_s': 0.0, 'max_s': 0.0, 'commands': 0, 'errors': 0})
+        totals['count'] += 1
+        totals['total_s'] += duration
+        totals['max_s'] = max(totals['max_s'], duration)
+        totals['commands'] += commands
+        totals['errors'] += error is not None
+
+        if self.file:
+            event = {'span': name, 'start': round(start_time, 3), 'duration_s': round(duration, 4),
+                     'commands': commands, 'depth': self.depth}
+            if error:
+                event['error'] = error
+            if attrs:
+                event.update(attrs)
+            self.file.write(json.dumps(event) + '\n')
+
+    def summary(self) -> Dict[str, dict]:
+        return {
+            name: {
+                'count': t['count'],
+                'total_s': round(t['total_s'], 3),
+                'avg_s': round(t['total_s'] / t['count'], 4),
+                'max_s': round(t['max_s'], 4),
+                'commands': t['commands'],
+                'errors': t['errors'],
+            }
+            for name, t in sorted(self.totals.items(), key=lambda item: -item[1]['total_s'])
+        }
+
+    def report(self) -> None:
+        """Log the per-span summary, slowest span first."""
+        lines = [f"{'span':<24}{'count':>7}{'total s':>10}{'avg s':>9}{'max s':>9}{'commands':>10}"]
+        for name, t in self.summary().items():
+            lines.append(f"{name:<24}{t['count']:>7}{t['total_s']:>10.2f}{t['avg_s']:>9.3f}{t['max_s']:>9.3f}{t['commands']:>10}")
+        lines.append(f"WebDriver commands issued: {self.commands}")
+        logger.info("Trace summary:\n%s", '\n'.join(lines))
+
+    def close(self) -> None:
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def traced(name: str = None):
+    """Decorator that runs an InstagramScraper method inside a tracer span."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            with self.tracer.span(span_name):
+                return fn(self, *args, **kwargs)
+
+        return wrapper
+    return decorator
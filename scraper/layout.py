@@ -0,0 +1,252 @@
+"""Force-directed layout computed ahead of time so the browser only has to draw.
+
+Fruchterman-Reingold forces with Barnes-Hut repulsion: every iteration builds
+an adaptive quadtree over the node positions, splitting only cells that hold
+more than leaf_size nodes, so crowded regions get deep cells and empty space
+none. Every cell is the bounding square of its own nodes. A node is repelled
+by a cell's centre of mass when the cell looks small from where it is (size /
+distance < theta) and by the cell's contents otherwise, down to the nodes of a
+leaf. Both the tree and the traversal are vectorized over all nodes a level at
+a time, so an iteration is O(n log n) in time and O(n) in memory however
+unevenly the nodes are spread.
+"""
+import math
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Distance between linked nodes, matches forceLink().distance in NetworkGraph.tsx
+IDEAL_DISTANCE = 100.0
+
+# Below this many levels the cells are smaller than float precision can
+# separate, so whatever is left in a cell there becomes one leaf
+MAX_TREE_DEPTH = 48
+
+
+def _expand(parents: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """For each parent i, the range starts[i]..starts[i] + counts[i] - 1.
+    Returns:
+        (parent, index) arrays with one entry per element of every range
+    """
+    total = int(counts.sum())
+    parent = np.repeat(parents, counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return parent, np.repeat(starts, counts) + offsets
+
+
+def _build_quadtree(pos: np.ndarray, leaf_size: int) -> dict:
+    """Adaptive quadtree over pos, built one level at a time.
+
+    Cells are numbered level by level, and the children of a cell are
+    consecutive, so the tree is a handful of flat arrays: per cell its
+    centre, half width, node count, centre of mass, children range and, for
+    leaves, the range of its nodes in members.
+    """
+    n = len(pos)
+    lo, hi = pos.min(axis=0), pos.max(axis=0)
+    centres = [(lo + hi)[None] / 2]
+    halves = [np.array([max(float((hi - lo).max()) / 2, 1e-9) * (1 + 1e-9)])]
+    counts = [np.array([n])]
+    coms = [pos.mean(axis=0)[None]]
+    child_starts, child_counts = [], []
+
+    # Nodes still in a cell that is being split, and that cell's index within its level
+    nodes = np.arange(n)
+    cell = np.zeros(n, dtype=np.int64)
+    leaf_of = np.zeros(n, dtype=np.int64)  # Final cell of every node, as a global index
+    offset = 0  # Global index of the first cell of the current level
+    for depth in range(MAX_TREE_DEPTH + 1):
+        level_size = len(counts[-1])
+        split = counts[-1] > leaf_size if depth < MAX_TREE_DEPTH else np.zeros(level_size, dtype=bool)
+        stays = ~split[cell]
+        leaf_of[nodes[stays]] = offset + cell[stays]
+        nodes, cell = nodes[~stays], cell[~stays]
+        if not nodes.size:
+            child_starts.append(np.zeros(level_size, dtype=np.int64))
+            child_counts.append(np.zeros(level_size, dtype=np.int64))
+            break
+
+        # Quadrant of each node within its cell, and one child cell per occupied quadrant
+        p = pos[nodes]
+        centre = centres[-1][cell]
+        quadrant = (p[:, 0] >= centre[:, 0]) * 2 + (p[:, 1] >= centre[:, 1])
+        keys, child = np.unique(cell * 4 + quadrant, return_inverse=True)
+        child = child.reshape(-1)
+        parent = keys // 4
+        # Children are shrunk to the bounding square of their nodes, so a dense
+        # cluster far from everything else is reached in one level rather than
+        # through a chain of cells with a single occupied quadrant each
+        order = np.argsort(child, kind='stable')
+        starts = np.searchsorted(child[order], np.arange(len(keys)))
+        child_lo = np.minimum.reduceat(p[order], starts, axis=0)
+        child_hi = np.maximum.reduceat(p[order], starts, axis=0)
+        centres.append((child_lo + child_hi) / 2)
+        halves.append(np.maximum((child_hi - child_lo).max(axis=1) / 2, 1e-9) * (1 + 1e-9))
+        count = np.bincount(child, minlength=len(keys))
+        counts.append(count)
+        com = np.stack([np.bincount(child, weights=p[:, axis], minlength=len(keys)) for axis in (0, 1)], axis=1)
+        coms.append(com / count[:, None])
+
+        next_offset = offset + level_size
+        first = np.searchsorted(parent, np.arange(level_size))
+        child_starts.append(next_offset + first)
+        child_counts.append(np.bincount(parent, minlength=level_size))
+        offset = next_offset
+        cell = child
+
+    counts = np.concatenate(counts)
+    child_count = np.concatenate(child_counts)
+    members = np.argsort(leaf_of, kind='stable')
+    leaf_start = np.searchsorted(leaf_of[members], np.arange(len(counts)))
+    return {
+        'centre': np.concatenate(centres),
+        'half': np.concatenate(halves),
+        'count': counts,
+        'com': np.concatenate(coms),
+        'child_start': np.concatenate(child_starts),
+        'child_count': child_count,
+        'members': members,
+        'leaf_start': leaf_start,
+        'leaf_count': np.where(child_count == 0, counts, 0),
+    }
+
+
+def _repulsion(pos: np.ndarray, k2: float, theta: float = 0.7, leaf_size: int = 8) -> np.ndarray:
+    n = len(pos)
+    force = np.zeros_like(pos)
+    if n < 2:
+        return force
+    tree = _build_quadtree(pos, leaf_size)
+    theta2 = theta * theta
+
+    # (node, cell) pairs still to be resolved, starting from the root for every node
+    node = np.arange(n)
+    cell = np.zeros(n, dtype=np.int64)
+    while node.size:
+        p = pos[node]
+        delta = p - tree['com'][cell]
+        d2 = delta[:, 0] ** 2 + delta[:, 1] ** 2 + 1e-9
+        size = 2 * tree['half'][cell]
+        # A cell containing the node is never approximated, its centre of mass may be the node itself
+        inside = (np.abs(p - tree['centre'][cell]) <= tree['half'][cell][:, None]).all(axis=1)
+        far = (size * size < theta2 * d2) & ~inside
+        # Only leaves at MAX_TREE_DEPTH hold more than leaf_size nodes, and those all
+        # sit on the same spot: their centre of mass stands in for them
+        far |= tree['leaf_count'][cell] > leaf_size
+        scale = k2 * tree['count'][cell[far]] / d2[far]
+        for axis in (0, 1):
+            force[:, axis] += np.bincount(node[far], weights=delta[far, axis] * scale, minlength=n)
+
+        # Leaves that are too close: exact forces from each of their nodes
+        near = ~far
+        leaf = near & (tree['child_count'][cell] == 0)
+        source, index = _expand(node[leaf], tree['leaf_start'][cell[leaf]], tree['leaf_count'][cell[leaf]])
+        other = tree['members'][index]
+        keep = other != source
+        source, other = source[keep], other[keep]
+        delta = pos[source] - pos[other]
+        d2 = delta[:, 0] ** 2 + delta[:, 1] ** 2 + 1e-9
+        for axis in (0, 1):
+            force[:, axis] += np.bincount(source, weights=delta[:, axis] * k2 / d2, minlength=n)
+
+        # Other cells that are too close: look at their children instead
+        split = near & ~leaf
+        node, cell = _expand(node[split], tree['child_start'][cell[split]], tree['child_count'][cell[split]])
+    return force
+
+
+def force_layout(n: int, src: np.ndarray, dst: np.ndarray, positions: Optional[np.ndarray] = None,
+                 movable: Optional[np.ndarray] = None, iterations: int = 200,
+                 k: float = IDEAL_DISTANCE, gravity: float = 0.05, seed: int = 0) -> np.ndarray:
+    """Compute node positions.
+    Args:
+        n: Number of nodes
+        src, dst: Edge endpoints as node ids
+        positions: Starting positions (n, 2); random if not given
+        movable: Boolean mask of nodes allowed to move; all if not given
+        iterations: Simulation steps
+        k: Ideal edge length
+        gravity: Pull towards the centre that keeps disconnected parts close
+    Returns:
+        Positions as an (n, 2) array
+    """
+    rng = np.random.default_rng(seed)
+    if positions is None:
+        positions = rng.uniform(-1, 1, (n, 2)) * k * math.sqrt(max(n, 1))
+    pos = np.array(positions, dtype=float)
+    movable = np.ones(n, dtype=bool) if movable is None else np.asarray(movable, dtype=bool)
+    if n == 0 or not movable.any():
+        return pos
+
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    k2 = k * k
+    temperature = k * math.sqrt(n) / 10
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        force = _repulsion(pos, k2)
+
+        # Attraction along edges: d^2 / k pulling the endpoints together
+        delta = pos[dst] - pos[src]
+        dist = np.sqrt((delta ** 2).sum(axis=1)) + 1e-9
+        pull = delta * (dist / k)[:, None]
+        for axis in (0, 1):
+            force[:, axis] += np.bincount(src, weights=pull[:, axis], minlength=n)
+            force[:, axis] -= np.bincount(dst, weights=pull[:, axis], minlength=n)
+
+        force -= gravity * pos
+
+        # Move each node at most `temperature` along its net force
+        length = np.sqrt((force ** 2).sum(axis=1)) + 1e-9
+        step = force * (np.minimum(length, temperature) / length)[:, None]
+        pos[movable] += step[movable]
+        temperature = max(temperature - cooling, 1e-3)
+
+    return pos
+
+
+def layout_graph(graph: dict, previous: Dict[str, Tuple[float, float]] = None, iterations: int = 200) -> np.ndarray:
+    """Lay out a compact graph from graph_export.build_compact_graph.
+
+    With previous positions (username -> (x, y)) only new nodes and their
+    neighbours move; everything else stays where it was, so re-running after
+    a crawl adds users keeps the picture stable and converges quickly.
+    The main user (graph['root']) ends up at the origin.
+    """
+    usernames = graph['nodes']['id']
+    n = len(usernames)
+    indptr = np.asarray(graph['edges']['indptr'], dtype=np.int64)
+    dst = np.asarray(graph['edges']['indices'], dtype=np.int64)
+    src = np.repeat(np.arange(n), np.diff(indptr))
+
+    positions = None
+    movable = None
+    if previous:
+        known = np.array([u in previous for u in usernames], dtype=bool)
+        if known.any():
+            positions = np.array([previous.get(u, (0.0, 0.0)) for u in usernames], dtype=float)
+            new = ~known
+            # Place new nodes next to the average of their already placed neighbours
+            node = np.concatenate([src, dst])
+            neighbour = np.concatenate([dst, src])
+            placed = known[neighbour]
+            totals = np.zeros((n, 2))
+            np.add.at(totals, node[placed], positions[neighbour[placed]])
+            degree = np.bincount(node[placed], minlength=n)
+            rng = np.random.default_rng(0)
+            jitter = rng.normal(scale=IDEAL_DISTANCE / 2, size=(n, 2))
+            centre = positions[known].mean(axis=0)
+            anchored = new & (degree > 0)
+            positions[anchored] = totals[anchored] / degree[anchored, None] + jitter[anchored]
+            loose = new & (degree == 0)
+            positions[loose] = centre + jitter[loose] * 4
+
+            movable = new.copy()
+            movable[neighbour[new[node]]] = True
+
+    pos = force_layout(n, src, dst, positions, movable, iterations)
+    root = graph.get('root', 0)
+    if n and movable is None:
+        pos -= pos[root]
+    return pos
@@ -0,0 +1,266 @@
+import time
+import queue
+import logging
+import threading
+from typing import List, Optional, Tuple
+from storage import SQLiteStore
+from frontier import CrawlFrontier
+from history import HistoryStore
+from delta import END_OF_LIST, INTERRUPTED, connection_delta, apply_delta
+from sinks import NDJSONSink
+
+logger = logging.getLogger(__name__)
+
+VALID_USERNAME_CHARS = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._')
+NON_USERNAMES = {'explore', 'direct', 'p', 'reels', 'stories', 'tags', 'locations'}
+
+# How the browser stage read a user, which decides what is written:
+FRESH = 'fresh'              # Not loaded, the stored record is recent enough
+COUNTS = 'counts'            # Celebrity or private: counts only, no lists
+COUNTS_ONLY = 'counts_only'  # Counts refreshed, stored lists still fresh
+DELTA = 'delta'              # Lists scrolled down to already stored entries
+FULL = 'full'                # Both lists scrolled to the end
+
+_STOP = object()
+
+
+def is_valid_username(text: str) -> bool:
+    """Helper function to validate usernames"""
+    if not text:
+        return False
+
+    # Skip common non-username texts
+    if text.startswith(('Follow', 'Following', 'Remove', '#', '@')):
+        return False
+
+    # Skip if contains spaces or newlines
+    if ' ' in text or '\n' in text:
+        return False
+
+    # Skip common button texts
+    if text.lower() in ['follow', 'following', 'remove', 'verified']:
+        return False
+
+    # Skip if too long or too short
+    if len(text) < 2 or len(text) > 30:
+        return False
+
+    # Skip if contains invalid characters
+    if not all(c in VALID_USERNAME_CHARS for c in text):
+        return False
+
+    # Skip common non-username paths
+    if text in NON_USERNAMES:
+        return False
+
+    return True
+
+
+def clean_usernames(usernames: List[str]) -> List[str]:
+    """Valid usernames in their original order, without duplicates."""
+    return [username for username in dict.fromkeys(usernames) if is_valid_username(username)]
+
+
+class ResultWriter:
+    """Turns what the browser read for a user into store, history and frontier updates.
+
+    A result is a dict with username and mode (one of the constants above);
+    unless the mode is FRESH it also has profile (parse_profile_header output
+    with counts) and, for DELTA and FULL, the raw followers/following lists
+    as streamed from the dialogs plus stopped, which maps each list to why
+    scrolling its dialog stopped (one of the constants in delta).
+
+    A FULL result with a list that was cut short is refused (write raises),
+    since a prefix saved as the whole list would look fresh and never be
+    read to the end; the pipeline then marks the user failed for a retry. A
+    cut short DELTA result still adds what it read but leaves the lists
+    stale.
+    """
+
+    def __init__(self, store: SQLiteStore, frontier: Optional[CrawlFrontier], history: HistoryStore,
+                 celebrity_threshold: int = 3000, max_depth: Optional[int] = None):
+        self.store = store
+        self.frontier = frontier
+        self.history = history
+        self.celebrity_threshold = celebrity_threshold
+        self.max_depth = max_depth
+
+    def write(self, results: List[dict]) -> List[Tuple[List[str], List[str]]]:
+        """Persist a batch of results in one transaction.
+        Returns:
+            The followers and following lists now stored for each result
+        """
+        with self.store.transaction():
+            return [self.write_one(result) for result in results]
+
+    def write_one(self, result: dict) -> Tuple[List[str], List[str]]:
+        username = result['username']
+        mode = result['mode']
+        stored = self.store.get_user(username) or {'followers': [], 'following': []}
+
+        with self.store.transaction():
+            if mode == FRESH:
+                followers, following = stored['followers'], stored['following']
+            elif mode == COUNTS_ONLY:
+                followers, following = stored['followers'], stored['following']
+                self.store.save_user(username, self._record(result, followers), update_connections=False)
+            elif mode == COUNTS:
+                followers, following = [], []
+                self.store.save_user(username, self._record(result, followers, following))
+            elif mode == DELTA:
+                deltas = {}
+                for kind in ('followers', 'following'):
+                    deltas[kind] = connection_delta(clean_usernames(result[kind]), stored[kind],
+                                                    self._stopped(result, kind))
+                    logger.info(f"{kind.capitalize()} of {username}: {len(deltas[kind][0])} added, "
+                                f"{len(deltas[kind][1])} removed")
+                followers = apply_delta(stored['followers'], *deltas['followers'])
+                following = apply_delta(stored['following'], *deltas['following'])
+                complete = INTERRUPTED not in (self._stopped(result, kind) for kind in deltas)
+                self.store.save_user_delta(username, self._record(result, followers), deltas, complete)
+                self._record_history(username, followers, following)
+            else:
+                interrupted = [kind for kind in ('followers', 'following') if self._stopped(result, kind) == INTERRUPTED]
+                if interrupted:
+                    raise RuntimeError(f"{' and '.join(interrupted).capitalize()} of {username} only partly read")
+                followers = clean_usernames(result['followers'])
+                following = clean_usernames(result['following'])
+                self.store.save_user(username, self._record(result, followers, following))
+                self._record_history(username, followers, following)
+
+            if self.frontier is not None and self.max_depth is not None:
+                queued = self.frontier.complete(username, followers + following, self.max_depth)
+                if queued:
+                    logger.info(f"Queued {queued} new users from {username}")
+        return followers, following
+
+    def profile_of(self, result: dict) -> dict:
+        """Counts and profile name for a written result, from the store if the page was not loaded."""
+        return result.get('profile') or self.store.get_user(result['username']) or {}
+
+    @staticmethod
+    def _stopped(result: dict, kind: str) -> str:
+        return result.get('stopped', {}).get(kind, END_OF_LIST)
+
+    def _record(self, result: dict, followers: List[str], following: List[str] = None) -> dict:
+        # The lists are part of the record only when following is given
+        profile = result['profile']
+        record = {
+            'followers_count': profile['followers_count'],
+            'following_count': profile['following_count'],
+            'is_celebrity': max(profile['followers_count'], len(followers)) > self.celebrity_threshold,
+            'profile_name': profile['profile_name'],
+            'last_updated': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        if following is not None:
+            record['followers'] = followers
+            record['following'] = following
+        return record
+
+    def _record_history(self, username: str, followers: List[str], following: List[str]) -> None:
+        self.history.record_list(username, 'followers', followers)
+        self.history.record_list(username, 'following', following)
+
+
+class PersistPipeline:
+    """Background writer between the browser and the store.
+
+    The browser stage submits raw results and goes on to the next profile; a
+    worker thread with its own connection to the same SQLite file validates,
+    deduplicates, persists and completes them in the frontier, up to
+    batch_size results per transaction. The queue is bounded, so a browser
+    far ahead of the writer blocks instead of piling up results in memory.
+    Committed results are streamed to sink, if given.
+    """
+
+    def __init__(self, store_path: str, max_depth: int, celebrity_threshold: int = 3000,
+                 max_attempts: int = 3, batch_size: int = 20, queue_size: int = 100,
+                 sink: Optional[NDJSONSink] = None):
+        self.store_path = store_path
+        self.sink = sink
+        self.max_depth = max_depth
+        self.celebrity_threshold = celebrity_threshold
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._run, name='persist', daemon=True)
+        self.written = 0
+        self.failed = 0
+
+    def start(self) -> 'PersistPipeline':
+        self.thread.start()
+        return self
+
+    def submit(self, result: dict) -> None:
+        """Hand a result to the writer, waiting only if the queue is full."""
+        if not self.thread.is_alive():
+            raise RuntimeError("Persist pipeline is not running")
+        self.queue.put(result)
+
+    def drain(self) -> None:
+        """Wait until everything submitted so far has been written."""
+        # Like queue.join(), but gives up if the worker has died
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks and self.thread.is_alive():
+                self.queue.all_tasks_done.wait(0.1)
+
+    def close(self) -> None:
+        """Write what is still queued and stop the worker."""
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+
+    def _run(self) -> None:
+        # SQLite connections belong to the thread that opened them
+        store = SQLiteStore(self.store_path)
+        frontier = CrawlFrontier(store, max_attempts=self.max_attempts, celebrity_threshold=self.celebrity_threshold)
+        writer = ResultWriter(store, frontier, HistoryStore(store), self.celebrity_threshold, self.max_depth)
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self.queue.get()]
+                # Take whatever else is already waiting, up to a batch
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if _STOP in batch:
+                    stopping = True
+                results = [item for item in batch if item is not _STOP]
+                try:
+                    self._write(writer, frontier, results)
+                finally:
+                    for _ in batch:
+                        self.queue.task_done()
+        finally:
+            store.close()
+
+    def _write(self, writer: ResultWriter, frontier: CrawlFrontier, results: List[dict]) -> None:
+        if not results:
+            return
+        try:
+            lists = writer.write(results)
+        except Exception as e:
+            logger.warning(f"Batch of {len(results)} results failed ({e}), writing them one by one")
+        else:
+            self.written += len(results)
+            self._emit(writer, results, lists)
+            return
+        for result in results:
+            try:
+                lists = writer.write([result])
+            except Exception as e:
+                logger.error(f"Error saving user {result['username']}: {e}")
+                frontier.mark_failed(result['username'], str(e))
+                self.failed += 1
+            else:
+                self.written += 1
+                self._emit(writer, [result], lists)
+
+    def _emit(self, writer: ResultWriter, results: List[dict], lists: List[Tuple[List[str], List[str]]]) -> None:
+        # Only after the commit, so nothing streamed is rolled back later
+        if self.sink is None:
+            return
+        for result, (followers, following) in zip(results, lists):
+            self.sink.emit(result['username'], result['mode'], writer.profile_of(result), followers, following)
@@ -0,0 +1,135 @@
+import re
+import logging
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PRIVATE_MARKER = 'This account is private'
+
+
+class _ProfileHeaderParser(HTMLParser):
+    """Single pass over a profile page snapshot.
+
+    Picks up the same elements the scraper used to look up one by one: the
+    first span.x1lliihq inside "header section" (display name), the first
+    links to /followers and /following (counts) and the private account
+    notice.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.header_depth = 0
+        self.section_depth = 0
+        self.name: Optional[str] = None
+        self.name_parts: Optional[List[str]] = None
+        self.name_span_depth = 0
+        self.link_kind: Optional[str] = None
+        self.link_parts: List[str] = []
+        self.links: Dict[str, str] = {}
+        self.header_parts: List[str] = []
+        self.is_private = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'header':
+            self.header_depth += 1
+        elif tag == 'section' and self.header_depth:
+            self.section_depth += 1
+        elif tag == 'span':
+            if self.name_parts is not None:
+                self.name_span_depth += 1
+            elif self.name is None and self.section_depth:
+                classes = (dict(attrs).get('class') or '').split()
+                if 'x1lliihq' in classes:
+                    self.name_parts = []
+                    self.name_span_depth = 1
+        elif tag == 'a' and self.link_kind is None:
+            href = dict(attrs).get('href') or ''
+            for kind in ('followers', 'following'):
+                if f'/{kind}' in href and kind not in self.links:
+                    self.link_kind = kind
+                    self.link_parts = []
+                    break
+
+    def handle_endtag(self, tag):
+        if tag == 'header' and self.header_depth:
+            self.header_depth -= 1
+        elif tag == 'section' and self.section_depth:
+            self.section_depth -= 1
+        elif tag == 'span' and self.name_parts is not None:
+            self.name_span_depth -= 1
+            if self.name_span_depth == 0:
+                self.name = _clean(''.join(self.name_parts))
+                self.name_parts = None
+        elif tag == 'a' and self.link_kind is not None:
+            self.links[self.link_kind] = _clean(' '.join(self.link_parts))
+            self.link_kind = None
+
+    def handle_data(self, data):
+        if self.name_parts is not None:
+            self.name_parts.append(data)
+        if self.link_kind is not None:
+            self.link_parts.append(data)
+        if self.header_depth:
+            self.header_parts.append(data)
+        if PRIVATE_MARKER in data:
+            self.is_private = True
+
+
+def _clean(text: str) -> str:
+    return ' '.join(text.split())
+
+
+def parse_profile_header(html: str) -> dict:
+    """Parse a profile page snapshot into its header fields.
+
+    Private profiles show their counts as plain text rather than links, so
+    when a link is missing the count is looked for in the header text instead.
+    Args:
+        html: Page source or the outerHTML of the page's <main> element
+    Returns:
+        Dict with profile_name, followers_text, following_text (raw count
+        texts such as '61.2k followers', '' if not found) and is_private
+    """
+    parser = _ProfileHeaderParser()
+    parser.feed(html)
+    parser.close()
+
+    header_text = _clean(' '.join(parser.header_parts))
+    counts = {}
+    for kind in ('followers', 'following'):
+        text = parser.links.get(kind, '')
+        if not text:
+            match = re.search(rf'([\d.,]+\s*[kKmM]?)\s+{kind}', header_text)
+            text = f'{match.group(1)} {kind}' if match else ''
+        counts[kind] = text
+
+    return {
+        'profile_name': parser.name or '',
+        'followers_text': counts['followers'],
+        'following_text': counts['following'],
+        'is_private': parser.is_private,
+    }
+
+
+def convert_count_to_number(count_text: str) -> int:
+    """Convert Instagram count format (e.g., '61.2k', '1.2M', '1,234 followers') to number, 0 if unreadable"""
+    try:
+        # Keep only the number (e.g. '61.2k followers' -> '61.2k'), remove commas and convert to lowercase
+        count_text = count_text.replace(',', '').lower().strip().split()[0]
+
+        # Handle 'k' thousands
+        if 'k' in count_text:
+            number = float(count_text.replace('k', ''))
+            return int(number * 1000)
+
+        # Handle 'M' millions
+        if 'm' in count_text:
+            number = float(count_text.replace('m', ''))
+            return int(number * 1000000)
+
+        # Handle regular numbers
+        return int(count_text)
+    except Exception as e:
+        logger.error(f"Error converting count '{count_text}': {e}")
+        return 0
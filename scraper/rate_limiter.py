@@ -0,0 +1,92 @@
+import time
+import logging
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class RequestScheduler:
+    """Token bucket that every page load and dialog open goes through.
+
+    Tokens refill continuously at requests_per_hour / 3600 per second up to
+    burst, so the crawl runs as fast as the hourly budget allows and never
+    faster. After batch_size users a fixed cool-down is taken on top; users
+    that were served without a single request (e.g. from the store) do not
+    count towards a batch.
+
+    clock and sleep are injectable so the scheduler can be driven by a fake
+    clock in tests and benchmarks.
+    """
+
+    def __init__(self, requests_per_hour: int, batch_size: int, batch_cooldown: float = 60.0,
+                 burst: int = 5, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = requests_per_hour / 3600.0
+        self.capacity = max(1, burst)
+        self.batch_size = batch_size
+        self.batch_cooldown = batch_cooldown
+        self.clock = clock
+        self.sleep = sleep
+
+        self.tokens = float(self.capacity)
+        self.last_refill = clock()
+        self.batch_items = 0
+        self.item_requests = 0  # Requests made for the current user
+        self.cooldown_pending = False
+        self.requests: Dict[str, int] = {}
+        self.total_wait = 0.0
+        self.last_wait = 0.0
+
+    def acquire(self, kind: str = 'request') -> float:
+        """Block until a request may be made.
+        Args:
+            kind: Label used for the per-kind request counts in stats()
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        if self.cooldown_pending:
+            logger.info(f"Batch of {self.batch_size} users done, cooling down for {self.batch_cooldown:.0f}s...")
+            self.sleep(self.batch_cooldown)
+            waited += self.batch_cooldown
+            self.cooldown_pending = False
+
+        self._refill()
+        if self.tokens < 1:
+            delay = (1 - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+            self._refill()
+
+        self.tokens -= 1
+        self.item_requests += 1
+        self.requests[kind] = self.requests.get(kind, 0) + 1
+        self.last_wait = waited
+        self.total_wait += waited
+        return waited
+
+    def finish_item(self) -> None:
+        """Count a finished user towards the current batch, if it made any requests."""
+        if not self.item_requests:
+            return
+        self.item_requests = 0
+        self.batch_items += 1
+        if self.batch_items >= self.batch_size:
+            self.batch_items = 0
+            self.cooldown_pending = True
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            'tokens_left': round(self.tokens, 2),
+            'requests': dict(self.requests),
+            'total_requests': sum(self.requests.values()),
+            'batch_items': self.batch_items,
+            'last_wait': round(self.last_wait, 2),
+            'total_wait': round(self.total_wait, 2),
+        }
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
@@ -0,0 +1,120 @@
+import json
+import logging
+from typing import Dict, List, Optional
+from storage import write_json_atomic
+from waits import Waiter
+
+logger = logging.getLogger(__name__)
+
+# Candidates per page element, most likely first. A candidate is a CSS
+# selector plus optional conditions checked in the page:
+#   text: the element's text contains this, case-insensitively (CSS has no :contains)
+#   scrollable: the element actually scrolls its content
+SELECTOR_ROLES: Dict[str, List[dict]] = {
+    'login_username': [
+        {'css': 'input[name="username"]'},
+        {'css': 'input[aria-label="Phone number, username, or email"]'},
+    ],
+    'login_password': [
+        {'css': 'input[name="password"]'},
+        {'css': 'input[aria-label="Password"]'},
+    ],
+    'login_button': [
+        {'css': 'button[type="submit"]'},
+        {'css': 'button', 'text': 'Log in'},
+        {'css': 'button', 'text': 'Sign in'},
+        {'css': 'div[role="button"]', 'text': 'Log in'},
+    ],
+    'dialog_scrollable': [
+        {'css': '.xyi19xy.x1ccrb07.xtf3nb5.x1pc53ja.x1lliihq.x1iyjqo2.xs83m0k.xz65tgg.x1rife3k.x1n2onr6'},
+        {'css': '.x9f619.xjbqb8w.x78zum5.x168nmei.x13lgxp2.x5pf9jr.xo71vjh.x1n2onr6.x6ikm8r.x1rife3k.x1iyjqo2'
+                '.x2lwn1j.xeuugli.xdt5ytf.xqjyukv.x1qjc9v5.x1oa3qoh.x1nhvcw1'},
+        # Survives class name changes: any container in the dialog that scrolls
+        {'css': 'div', 'scrollable': True},
+    ],
+}
+
+# Tests every candidate in order in one round trip and returns
+# [index, element] for the first visible match, or null
+FIND_SCRIPT = """
+const root = arguments[0] || document;
+const candidates = arguments[1];
+const visible = (el) => el.getClientRects().length > 0 && !el.disabled;
+for (let i = 0; i < candidates.length; i++) {
+    const candidate = candidates[i];
+    let elements;
+    try {
+        elements = root.querySelectorAll(candidate.css);
+    } catch (e) {
+        continue;
+    }
+    for (const el of elements) {
+        if (!visible(el)) continue;
+        if (candidate.text && !el.textContent.toLowerCase().includes(candidate.text.toLowerCase())) continue;
+        if (candidate.scrollable) {
+            const overflow = getComputedStyle(el).overflowY;
+            if (el.scrollHeight <= el.clientHeight || (overflow !== 'auto' && overflow !== 'scroll')) continue;
+        }
+        return [i, el];
+    }
+}
+return null;
+"""
+
+
+class SelectorRegistry:
+    """Finds page elements by role, trying all fallback selectors at once.
+
+    Each poll is a single script call that tests every candidate for the role,
+    so a selector that no longer matches costs nothing extra. The candidate
+    that matched is saved to disk and tried first on the next run.
+    """
+
+    def __init__(self, driver, waiter: Waiter, path: Optional[str] = 'data/selectors.json',
+                 roles: Dict[str, List[dict]] = None):
+        self.driver = driver
+        self.waiter = waiter
+        self.path = path
+        self.roles = roles or SELECTOR_ROLES
+        self.cache = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def candidates(self, role: str) -> List[dict]:
+        """Candidates for a role, the one that matched last time first."""
+        candidates = list(self.roles[role])
+        cached = self.cache.get(role)
+        if cached in candidates:
+            candidates.remove(cached)
+            candidates.insert(0, cached)
+        return candidates
+
+    def find(self, role: str, root=None, timeout: float = None, minimum: float = 0.0):
+        """Wait for an element matching any candidate for role.
+        Args:
+            role: Key of the roles table
+            root: Element to search inside, the whole document if None
+            timeout: Seconds to wait for any candidate to match
+        Returns:
+            The WebElement, or None if nothing matched before the timeout
+        """
+        candidates = self.candidates(role)
+        found = self.waiter.for_script(FIND_SCRIPT, root, candidates, timeout=timeout, minimum=minimum)
+        if not found:
+            logger.debug(f"No selector matched for {role}")
+            return None
+        index, element = found
+        winner = candidates[index]
+        if self.cache.get(role) != winner:
+            logger.debug(f"Selector for {role} is now {winner}")
+            self.cache[role] = winner
+            if self.path:
+                write_json_atomic(self.path, self.cache, indent=2)
+        return element
@@ -0,0 +1,109 @@
+import os
+import json
+import zlib
+import hashlib
+from typing import Dict, List, Tuple
+from storage import SQLiteStore, write_json_atomic
+
+SHARD_FORMAT_VERSION = 1
+
+# Average shard size to aim for, counting each user once plus every entry in
+# its lists; about half a megabyte of JSON with positions
+ENTRIES_PER_SHARD = 10_000
+
+
+def shard_bucket(username: str, buckets: int) -> int:
+    """Stable bucket for a username, the same on every export."""
+    return zlib.crc32(username.encode()) % buckets
+
+
+def shard_count(entries: int, entries_per_shard: int = ENTRIES_PER_SHARD) -> int:
+    """Number of buckets that keeps the average shard under entries_per_shard.
+
+    A power of two, so it only changes (and renames every shard) each time
+    the crawl doubles in size.
+    """
+    buckets = 1
+    while buckets * entries_per_shard < entries:
+        buckets *= 2
+    return buckets
+
+
+def export_shards(store: SQLiteStore, directory: str = 'public/shards', index_path: str = 'public/index.json',
+                  buckets: int = None, positions: Dict[str, Tuple[float, float]] = None,
+                  root: str = None) -> dict:
+    """Export the store as a small index plus content-addressed shard files.
+
+    Users are spread over buckets by username hash; unless given, the number
+    of buckets grows with the stored users and list entries (see
+    shard_count), so a shard stays about the same size however large the
+    crawl gets. Each bucket is written to <sha1 of its content>.json, so
+    shards whose users did not change keep their name and stay cached;
+    shards no longer referenced are removed. The index maps every username
+    to its shard plus the counts needed to draw a node without loading the
+    shard:
+
+        {"version": 1, "root": "<main user>", "buckets": 64,
+         "users": {"<username>": ["<shard>", followers_count, following_count, is_celebrity]}}
+
+    With positions (username -> (x, y), the layout of the compact graph),
+    each user in a shard also carries the positions of itself and everyone
+    in its lists, so the frontend can draw a user's network pinned at the
+    same layout as the full graph without simulating it. The index root is
+    root if it was crawled, otherwise the first stored user.
+    Returns:
+        Dict with the user and shard counts
+    """
+    os.makedirs(directory, exist_ok=True)
+    if buckets is None:
+        buckets = shard_count(store.user_count() + store.edge_count())
+    shards: List[Dict[str, dict]] = [{} for _ in range(buckets)]
+    counts = {}
+    first = None
+    for username, record in store.iter_users():
+        if first is None:
+            first = username
+        shard_user = {
+            'followers': record['followers'],
+            'following': record['following'],
+            'profile_name': record['profile_name'],
+            'last_updated': record['last_updated'],
+        }
+        if positions:
+            shard_user['positions'] = {
+                other: list(positions[other])
+                for other in (username, *record['followers'], *record['following']) if other in positions
+            }
+        shards[shard_bucket(username, buckets)][username] = shard_user
+        counts[username] = (record['followers_count'], record['following_count'], int(record['is_celebrity']))
+
+    users = {}
+    written = set()
+    for shard in shards:
+        if not shard:
+            continue
+        body = json.dumps(shard, separators=(',', ':'), sort_keys=True)
+        name = hashlib.sha1(body.encode()).hexdigest()[:16]
+        path = os.path.join(directory, f'{name}.json')
+        if not os.path.exists(path):
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        written.add(f'{name}.json')
+        for username in shard:
+            users[username] = [name, *counts[username]]
+
+    # Index last, so it never points at a shard that is not there yet
+    write_json_atomic(index_path, {
+        'version': SHARD_FORMAT_VERSION,
+        'root': root if root in counts else first,
+        'buckets': buckets,
+        'users': users,
+    }, separators=(',', ':'))
+
+    for filename in os.listdir(directory):
+        if filename.endswith('.json') and filename not in written:
+            os.remove(os.path.join(directory, filename))
+
+    return {'users': len(users), 'shards': len(written)}
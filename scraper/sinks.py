@@ -0,0 +1,52 @@
+import json
+import time
+import threading
+from typing import List, TextIO
+
+
+class NDJSONSink:
+    """Streams crawl results as newline-delimited JSON while the crawl runs.
+
+    Each written user produces one user line followed by its connections in
+    edge lines of at most edge_batch_size usernames, so a consumer can
+    process the stream with constant memory:
+
+        {"type": "user", "username": "...", "mode": "full", "followers_count": 120, ...}
+        {"type": "edges", "username": "...", "kind": "followers", "batch": 0, "others": ["...", ...]}
+
+    Lines are flushed per user; writes from the persist thread and the main
+    thread are serialized.
+    """
+
+    def __init__(self, stream: TextIO, edge_batch_size: int = 500):
+        self.stream = stream
+        self.edge_batch_size = edge_batch_size
+        self.lock = threading.Lock()
+        self.users = 0
+
+    def emit(self, username: str, mode: str, profile: dict, followers: List[str], following: List[str]) -> None:
+        """Write one user and its current followers/following lists."""
+        lines = [json.dumps({
+            'type': 'user',
+            'username': username,
+            'mode': mode,
+            'followers_count': profile.get('followers_count', 0),
+            'following_count': profile.get('following_count', 0),
+            'profile_name': profile.get('profile_name', ''),
+            'followers': len(followers),
+            'following': len(following),
+            'scraped_at': round(time.time(), 3),
+        })]
+        for kind, others in (('followers', followers), ('following', following)):
+            for batch, start in enumerate(range(0, len(others), self.edge_batch_size)):
+                lines.append(json.dumps({
+                    'type': 'edges',
+                    'username': username,
+                    'kind': kind,
+                    'batch': batch,
+                    'others': others[start:start + self.edge_batch_size],
+                }))
+        with self.lock:
+            self.stream.write('\n'.join(lines) + '\n')
+            self.stream.flush()
+            self.users += 1
@@ -0,0 +1,283 @@
+import os
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def write_json_atomic(path: str, data, **dump_kwargs) -> None:
+    """Write JSON to a temporary file and swap it in, so readers never see a partial file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, **dump_kwargs)
+    os.replace(tmp_path, path)
+
+
+class SQLiteStore:
+    """SQLite backed store with a users table and an edges table.
+
+    Each saved user is a single transaction touching only that user's rows, so
+    the cost of a save does not grow with the size of the crawl. The crawl
+    frontier and the list history keep their tables in the same database and
+    share conn and transaction(), and the persist pipeline opens its own
+    connection to path; the scraper never touches the file directly.
+    """
+
+    def __init__(self, path: str = 'data/user_data.db', timeout: float = 120.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # The persist pipeline writes batches of large users from a second
+        # connection while the crawl marks users in the frontier; either side
+        # waits up to timeout seconds for the other's transaction instead of
+        # failing with "database is locked"
+        self.conn = sqlite3.connect(path, timeout=timeout)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.transaction_depth = 0
+        self.create_tables()
+
+    @contextmanager
+    def transaction(self):
+        """Commit everything inside as one transaction.
+
+        Nested uses join the outermost one, so a caller can group several
+        saves (and frontier or history updates on the same connection) into
+        a single commit.
+        """
+        if self.transaction_depth:
+            self.transaction_depth += 1
+            try:
+                yield self.conn
+            finally:
+                self.transaction_depth -= 1
+            return
+        self.transaction_depth = 1
+        try:
+            with self.conn:
+                yield self.conn
+        finally:
+            self.transaction_depth = 0
+
+    def create_tables(self):
+        with self.transaction():
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    username TEXT PRIMARY KEY,
+                    followers_count INTEGER NOT NULL DEFAULT 0,
+                    following_count INTEGER NOT NULL DEFAULT 0,
+                    is_celebrity INTEGER NOT NULL DEFAULT 0,
+                    profile_name TEXT NOT NULL DEFAULT '',
+                    last_updated TEXT,
+                    counts_updated REAL,
+                    connections_updated REAL
+                )
+            ''')
+            # Stores created before the freshness columns existed
+            columns = {row[1] for row in self.conn.execute('PRAGMA table_info(users)')}
+            for column in ('counts_updated', 'connections_updated'):
+                if column not in columns:
+                    self.conn.execute(f'ALTER TABLE users ADD COLUMN {column} REAL')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS users_connections_updated ON users (connections_updated)')
+            # kind is either 'followers' or 'following'; position keeps the
+            # order in which the usernames were scraped
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS edges (
+                    username TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    other TEXT NOT NULL,
+                    PRIMARY KEY (username, kind, other)
+                ) WITHOUT ROWID
+            ''')
+
+    def save_user(self, username: str, record: dict, update_connections: bool = True) -> None:
+        """Save a user record.
+        Args:
+            username: The user to save
+            record: Dict in the user_data.json shape
+            update_connections: False to keep the stored followers/following
+                lists (and their timestamp) and only update counts
+        """
+        with self.transaction():
+            self._upsert_user(username, record, update_connections)
+            if not update_connections:
+                return
+            self.conn.execute('DELETE FROM edges WHERE username = ?', (username,))
+            for kind in ('followers', 'following'):
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO edges (username, kind, position, other) VALUES (?, ?, ?, ?)',
+                    ((username, kind, position, other) for position, other in enumerate(record.get(kind, [])))
+                )
+
+    def save_user_delta(self, username: str, record: dict, deltas: Dict[str, Tuple[List[str], List[str]]],
+                        complete: bool = True) -> None:
+        """Save a user's counts and change their connection lists by a delta instead of replacing them.
+        Args:
+            username: The user to save
+            record: Dict in the user_data.json shape; its followers/following are ignored
+            deltas: Maps 'followers'/'following' to (added, removed), added newest first
+            complete: False if a list was cut short; the delta is applied but
+                the lists keep their old timestamp, so they are refreshed again
+        """
+        # Only the changed rows are touched; added entries get positions
+        # above the current first one, so they sort to the top
+        with self.transaction():
+            self._upsert_user(username, record, complete)
+            for kind, (added, removed) in deltas.items():
+                self.conn.executemany(
+                    'DELETE FROM edges WHERE username = ? AND kind = ? AND other = ?',
+                    ((username, kind, other) for other in list(removed) + list(added))
+                )
+                if not added:
+                    continue
+                top = self.conn.execute(
+                    'SELECT COALESCE(MIN(position), 0) FROM edges WHERE username = ? AND kind = ?', (username, kind)
+                ).fetchone()[0]
+                start = top - len(added)
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO edges (username, kind, position, other) VALUES (?, ?, ?, ?)',
+                    ((username, kind, start + offset, other) for offset, other in enumerate(added))
+                )
+
+    def _upsert_user(self, username: str, record: dict, update_connections: bool) -> None:
+        updated = self._parse_timestamp(record.get('last_updated'))
+        # Upsert rather than replace so a user keeps its original rowid,
+        # which is what preserves the export order
+        self.conn.execute('''
+            INSERT INTO users
+                (username, followers_count, following_count, is_celebrity, profile_name, last_updated,
+                 counts_updated, connections_updated)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(username) DO UPDATE SET
+                followers_count = excluded.followers_count,
+                following_count = excluded.following_count,
+                is_celebrity = excluded.is_celebrity,
+                profile_name = excluded.profile_name,
+                last_updated = excluded.last_updated,
+                counts_updated = excluded.counts_updated,
+                connections_updated = CASE WHEN ? THEN excluded.connections_updated ELSE connections_updated END
+        ''', (
+            username,
+            record.get('followers_count', 0),
+            record.get('following_count', 0),
+            int(bool(record.get('is_celebrity', False))),
+            record.get('profile_name', ''),
+            record.get('last_updated'),
+            updated,
+            updated if update_connections else None,
+            int(update_connections),
+        ))
+
+    def get_timestamps(self, username: str) -> Tuple[Optional[float], Optional[float]]:
+        """Return (counts_updated, connections_updated) as epoch seconds, None if never scraped."""
+        row = self.conn.execute(
+            'SELECT counts_updated, connections_updated FROM users WHERE username = ?', (username,)
+        ).fetchone()
+        return row if row else (None, None)
+
+    def stalest_users(self, older_than: float, limit: int = None) -> List[str]:
+        """Return users whose connections were last updated before older_than, stalest first."""
+        rows = self.conn.execute('''
+            SELECT username FROM users
+            WHERE connections_updated IS NULL OR connections_updated < ?
+            ORDER BY connections_updated IS NOT NULL, connections_updated
+            LIMIT ?
+        ''', (older_than, -1 if limit is None else limit))
+        return [row[0] for row in rows]
+
+    def get_user(self, username: str) -> Optional[dict]:
+        row = self.conn.execute('''
+            SELECT followers_count, following_count, is_celebrity, profile_name, last_updated
+            FROM users WHERE username = ?
+        ''', (username,)).fetchone()
+        if row is None:
+            return None
+
+        record = self._row_to_record(row)
+        for kind, other in self.conn.execute(
+            'SELECT kind, other FROM edges WHERE username = ? ORDER BY kind, position', (username,)
+        ):
+            record[kind].append(other)
+        return record
+
+    def iter_users(self) -> Iterable[tuple]:
+        """Yield (username, record) pairs in insertion order."""
+        connections: Dict[str, Dict[str, List[str]]] = {}
+        for username, kind, other in self.conn.execute(
+            'SELECT username, kind, other FROM edges ORDER BY username, kind, position'
+        ):
+            connections.setdefault(username, {'followers': [], 'following': []})[kind].append(other)
+
+        for username, *row in self.conn.execute('''
+            SELECT username, followers_count, following_count, is_celebrity, profile_name, last_updated
+            FROM users ORDER BY rowid
+        '''):
+            record = self._row_to_record(row)
+            record.update(connections.get(username, {}))
+            yield username, record
+
+    def user_count(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def edge_count(self) -> int:
+        """Number of entries in all stored followers/following lists."""
+        return self.conn.execute('SELECT COUNT(*) FROM edges').fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def import_json(self, path: str) -> int:
+        """Load a legacy user_data.json file into the store.
+        Returns:
+            Number of users imported
+        """
+        try:
+            with open(path, 'r') as f:
+                all_data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return 0
+
+        for username, record in all_data.items():
+            self.save_user(username, record)
+        return len(all_data)
+
+    def export_json(self, path: str) -> int:
+        """Write every stored user to the legacy user_data.json shape.
+
+        The file is written to a temporary path first and then swapped in, so a
+        crash mid-export never leaves a truncated file behind.
+        Returns:
+            Number of users exported
+        """
+        all_data = {username: record for username, record in self.iter_users()}
+        write_json_atomic(path, all_data, indent=2)
+        return len(all_data)
+
+    @staticmethod
+    def _parse_timestamp(last_updated: Optional[str]) -> Optional[float]:
+        """Convert a last_updated string to epoch seconds."""
+        if not last_updated:
+            return None
+        try:
+            return datetime.strptime(last_updated, '%Y-%m-%d %H:%M:%S').timestamp()
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _row_to_record(row) -> dict:
+        followers_count, following_count, is_celebrity, profile_name, last_updated = row
+        return {
+            'followers_count': followers_count,
+            'following_count': following_count,
+            'is_celebrity': bool(is_celebrity),
+            'followers': [],
+            'following': [],
+            'profile_name': profile_name,
+            'last_updated': last_updated,
+        }
@@ -0,0 +1,88 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from storage import SQLiteStore
+from analytics import load_edges, mutual_mask, node_metrics, graph_summary, common_neighbour_counts
+
+
+@pytest.fixture
+def store(tmp_path):
+    # a and b follow each other, c follows a, a follows d, b follows c:
+    # edges b->a, c->a, a->b, a->d, b->c, with a->b and b->a listed by both users
+    store = SQLiteStore(str(tmp_path / 'store.db'))
+    store.save_user('a', {'followers': ['b', 'c'], 'following': ['b', 'd'], 'followers_count': 5000})
+    store.save_user('b', {'followers': ['a'], 'following': ['a', 'c'], 'followers_count': 1})
+    yield store
+    store.close()
+
+
+def edge_set(usernames: pd.Index, edges: pd.DataFrame) -> set:
+    return {(usernames[src], usernames[dst]) for src, dst in zip(edges['src'], edges['dst'])}
+
+
+def test_load_edges_deduplicates_and_orients_follows(store):
+    usernames, edges = load_edges(store)
+    # Stored users first, in store order
+    assert list(usernames[:2]) == ['a', 'b']
+    assert sorted(usernames) == ['a', 'b', 'c', 'd']
+    assert len(edges) == 5
+    assert edge_set(usernames, edges) == {('b', 'a'), ('c', 'a'), ('a', 'b'), ('a', 'd'), ('b', 'c')}
+
+
+def test_mutual_mask():
+    edges = pd.DataFrame({'src': [0, 1, 2, 1, 3], 'dst': [1, 0, 3, 2, 0]})
+    assert mutual_mask(edges, 4).tolist() == [True, True, False, False, False]
+
+
+def test_node_metrics(store):
+    metrics = node_metrics(store)
+
+    assert metrics.loc['a', ['in_degree', 'out_degree', 'mutual_follows']].tolist() == [2, 2, 1]
+    assert metrics.loc['b', ['in_degree', 'out_degree', 'mutual_follows']].tolist() == [1, 2, 1]
+    assert metrics.loc['c', ['in_degree', 'out_degree', 'mutual_follows']].tolist() == [1, 1, 0]
+    assert metrics.loc['d', ['in_degree', 'out_degree', 'mutual_follows']].tolist() == [1, 0, 0]
+    assert metrics.loc['a', 'reciprocity'] == 0.5
+    assert metrics.loc['c', 'reciprocity'] == 0
+    assert math.isnan(metrics.loc['d', 'reciprocity'])
+
+    assert metrics['crawled'].to_dict() == {'a': True, 'b': True, 'c': False, 'd': False}
+    assert metrics.loc['a', 'followers_count'] == 5000
+    assert metrics.loc['d', 'followers_count'] == 0
+    assert metrics['is_celebrity'].to_dict() == {'a': True, 'b': False, 'c': False, 'd': False}
+
+
+def test_celebrity_from_observed_in_degree(store):
+    # a's scraped count says 0, but two followers of a were observed
+    store.save_user('a', {'followers_count': 0}, update_connections=False)
+    metrics = node_metrics(store, celebrity_threshold=1)
+    assert metrics['is_celebrity'].to_dict() == {'a': True, 'b': False, 'c': False, 'd': False}
+
+
+def test_graph_summary(store):
+    assert graph_summary(store) == {'nodes': 4, 'edges': 5, 'mutual_edges': 2, 'reciprocity': 0.4}
+
+
+def test_common_neighbour_counts(store):
+    # Undirected neighbours: a {b, c, d}, b {a, c}, c {a, b}, d {a}
+    pairs = pd.DataFrame({
+        'a': ['a', 'c', 'b', 'a', 'a', 'nobody'],
+        'b': ['b', 'd', 'c', 'd', 'nobody', 'b'],
+    }, index=[10, 11, 12, 13, 14, 15])
+    counts = common_neighbour_counts(store, pairs)
+
+    assert counts.index.tolist() == [10, 11, 12, 13, 14, 15]
+    # Unknown usernames count nothing rather than matching the last node
+    assert counts.tolist() == [1, 1, 1, 0, 0, 0]
+
+
+def test_common_neighbour_counts_without_edges(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'empty.db'))
+    store.save_user('a', {'followers': [], 'following': []})
+    pairs = pd.DataFrame({'a': ['a'], 'b': ['b']})
+    counts = common_neighbour_counts(store, pairs)
+    store.close()
+    assert counts.tolist() == [0]
+    assert counts.dtype == np.int64
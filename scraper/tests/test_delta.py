@@ -0,0 +1,65 @@
+from delta import END_OF_LIST, KNOWN_RUN, INTERRUPTED, connection_delta, apply_delta
+
+STORED = ['s1', 's2', 's3', 's4', 's5', 's6']
+
+
+def test_full_stream_adds_and_removes():
+    streamed = ['new1', 's1', 's3', 's4', 's5', 's6']
+    assert connection_delta(streamed, STORED) == (['new1'], ['s2'])
+
+
+def test_unchanged_list():
+    assert connection_delta(list(STORED), STORED) == ([], [])
+
+
+def test_early_stop_only_compares_down_to_the_known_run():
+    # Stopped after s2, s3, s4 in a row: s5 and s6 were never scrolled to
+    streamed = ['new1', 'new2', 's2', 's3', 's4']
+    added, removed = connection_delta(streamed, STORED, KNOWN_RUN)
+    assert added == ['new1', 'new2']
+    assert removed == ['s1']
+
+
+def test_short_known_run_compares_the_whole_list():
+    # The stream ended on a few known users because it reached the bottom
+    streamed = ['new1', 's2', 's3']
+    added, removed = connection_delta(streamed, STORED, END_OF_LIST)
+    assert added == ['new1']
+    assert removed == ['s1', 's4', 's5', 's6']
+
+
+def test_list_ending_after_a_long_known_run_compares_the_whole_list():
+    # The real end of the list came right after 20 known users: the 6 below them unfollowed
+    stored = [f's{i}' for i in range(26)]
+    streamed = ['new1'] + stored[:20]
+    added, removed = connection_delta(streamed, stored, END_OF_LIST)
+    assert added == ['new1']
+    assert removed == stored[20:]
+
+
+def test_incomplete_stream_never_removes():
+    # Cut short by the rate limit popup after two entries
+    streamed = ['new1', 's2']
+    assert connection_delta(streamed, STORED, INTERRUPTED) == (['new1'], [])
+
+
+def test_empty_stream_is_a_failed_read():
+    assert connection_delta([], STORED) == ([], [])
+
+
+def test_first_read_of_a_list():
+    assert connection_delta(['a', 'b'], []) == (['a', 'b'], [])
+
+
+def test_apply_delta_puts_added_on_top_and_drops_removed():
+    assert apply_delta(STORED, ['new1', 'new2'], ['s2', 's5']) == ['new1', 'new2', 's1', 's3', 's4', 's6']
+
+
+def test_apply_delta_moves_readded_users_to_the_top():
+    assert apply_delta(['a', 'b', 'c'], ['c'], []) == ['c', 'a', 'b']
+
+
+def test_delta_round_trip():
+    streamed = ['new1', 's1', 's3', 's4']
+    added, removed = connection_delta(streamed, STORED, KNOWN_RUN)
+    assert apply_delta(STORED, added, removed) == ['new1', 's1', 's3', 's4', 's5', 's6']
@@ -0,0 +1,132 @@
+import pytest
+
+from storage import SQLiteStore
+from frontier import CrawlFrontier, DONE, PENDING
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'store.db'))
+    yield store
+    store.close()
+
+
+def score(frontier: CrawlFrontier, username: str) -> int:
+    return frontier.conn.execute('SELECT score FROM frontier WHERE username = ?', (username,)).fetchone()[0]
+
+
+def test_complete_queues_neighbours_one_hop_deeper(store):
+    frontier = CrawlFrontier(store)
+    assert frontier.complete('root', ['a', 'b', 'root'], max_depth=2) == 2
+
+    assert frontier.status('root') == DONE
+    assert frontier.status('a') == PENDING
+    assert frontier.depth('a') == 1
+    assert 'a' in frontier and 'zzz' not in frontier
+
+
+def test_no_neighbours_queued_at_max_depth(store):
+    frontier = CrawlFrontier(store)
+    frontier.complete('root', ['a'], max_depth=1)
+    assert frontier.complete('a', ['b'], max_depth=1) == 0
+    assert 'b' not in frontier
+
+
+def test_completing_again_does_not_count_links_twice(store):
+    frontier = CrawlFrontier(store)
+    frontier.complete('root', ['a', 'b'], max_depth=2)
+    frontier.complete('root', ['a', 'b'], max_depth=2)
+    assert score(frontier, 'a') == 1
+
+    # Reopening the frontier, as a restarted run does, keeps the recorded links
+    frontier = CrawlFrontier(store)
+    frontier.complete('root', ['a', 'b'], max_depth=2)
+    assert score(frontier, 'a') == 1
+
+
+def test_next_user_prefers_shallow_then_linked_users(store):
+    frontier = CrawlFrontier(store)
+    frontier.complete('root', ['a', 'b', 'c'], max_depth=3)
+    frontier.complete('a', ['c', 'd'], max_depth=3)
+    frontier.complete('b', ['c', 'd', 'e'], max_depth=3)
+
+    # c is the only depth 1 user left
+    assert frontier.next_user() == 'c'
+    frontier.complete('c', [], max_depth=3)
+    # d is linked from a and b, e only from b
+    assert score(frontier, 'd') == 2
+    assert frontier.next_user() == 'd'
+
+
+def test_known_celebrities_go_last(store):
+    store.save_user('famous', {'followers_count': 10_000, 'last_updated': '2026-01-01 00:00:00'})
+    frontier = CrawlFrontier(store, celebrity_threshold=3000)
+    frontier.complete('root', ['famous', 'regular'], max_depth=2)
+    assert frontier.next_user() == 'regular'
+
+
+def test_failed_users_are_retried_until_max_attempts(store):
+    frontier = CrawlFrontier(store, max_attempts=2)
+    frontier.add('a')
+    for _ in range(2):
+        assert frontier.next_user() == 'a'
+        frontier.mark_in_progress('a')
+        frontier.mark_failed('a', 'boom')
+    assert frontier.next_user() is None
+
+
+def test_recover_requeues_users_left_in_progress(store):
+    frontier = CrawlFrontier(store)
+    frontier.add('a')
+    frontier.mark_in_progress('a')
+    assert CrawlFrontier(store).recover() == 1
+    assert frontier.status('a') == PENDING
+
+
+def test_expand_reaches_further_when_max_depth_grows(store):
+    store.save_user('me', {'followers': ['a', 'b'], 'following': []})
+    store.save_user('a', {'followers': ['c'], 'following': ['me', 'd']})
+    frontier = CrawlFrontier(store)
+    frontier.complete('me', ['a', 'b'], max_depth=1)
+    frontier.complete('a', ['c', 'me', 'd'], max_depth=1)
+    frontier.complete('b', [], max_depth=1)
+    assert frontier.next_user() is None
+
+    # A later run asks for two hops: a's stored lists are queued without loading a again
+    frontier = CrawlFrontier(store)
+    assert frontier.complete('me', ['a', 'b'], max_depth=2) == 0
+    assert frontier.expand(max_depth=2) == 2
+    assert frontier.depth('c') == 2 and frontier.depth('d') == 2
+    assert frontier.next_user() in ('c', 'd')
+    assert score(frontier, 'c') == 1
+
+    # Expanded as far as asked, nothing more to do at this depth or a smaller one
+    assert frontier.expand(max_depth=2) == 0
+    assert frontier.expand(max_depth=1) == 0
+
+
+def test_seed_found_by_an_earlier_crawl_becomes_the_root(store):
+    frontier = CrawlFrontier(store)
+    frontier.complete('me', ['alice'], max_depth=1)
+    frontier.complete('alice', ['bob'], max_depth=1)
+    assert 'bob' not in frontier
+
+    frontier.set_root('alice')
+    assert frontier.depth('alice') == 0
+    assert frontier.complete('alice', ['bob', 'me'], max_depth=1) == 1
+    assert frontier.depth('bob') == 1
+
+
+def test_users_found_closer_are_expanded_again(store):
+    store.save_user('c', {'followers': ['d'], 'following': []})
+    frontier = CrawlFrontier(store)
+    frontier.complete('root', ['a'], max_depth=2)
+    frontier.complete('a', ['c'], max_depth=2)
+    frontier.complete('c', ['d'], max_depth=2)
+    assert 'd' not in frontier
+
+    # A new seed next to c: c is one hop out, so d is within two hops
+    frontier.set_root('b')
+    frontier.complete('b', ['c'], max_depth=2)
+    assert frontier.expand(max_depth=2) == 1
+    assert frontier.depth('d') == 2
@@ -0,0 +1,38 @@
+import pytest
+
+from storage import SQLiteStore
+from graph_export import build_compact_graph, SEEN_IN_FOLLOWERS, SEEN_IN_FOLLOWING
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'store.db'))
+    store.save_user('me', {'followers': ['alice'], 'following': ['alice', 'bob'], 'followers_count': 1})
+    store.save_user('alice', {'followers': ['me'], 'following': []})
+    yield store
+    store.close()
+
+
+def targets(graph: dict, username: str) -> dict:
+    ids = graph['nodes']['id']
+    source = ids.index(username)
+    edges = graph['edges']
+    start, end = edges['indptr'][source], edges['indptr'][source + 1]
+    return {ids[target]: kind for target, kind in zip(edges['indices'][start:end], edges['kind'][start:end])}
+
+
+def test_compact_graph(store):
+    graph = build_compact_graph(store)
+
+    assert graph['nodes']['id'] == ['me', 'alice', 'bob']
+    assert graph['nodes']['crawled'] == [1, 1, 0]
+    assert graph['root'] == 0
+    # me -> alice is in alice's followers and in my following
+    assert targets(graph, 'me') == {'alice': SEEN_IN_FOLLOWERS | SEEN_IN_FOLLOWING, 'bob': SEEN_IN_FOLLOWING}
+    assert targets(graph, 'alice') == {'me': SEEN_IN_FOLLOWERS}
+
+
+def test_compact_graph_root(store):
+    assert build_compact_graph(store, root='alice')['root'] == 1
+    # Not crawled: fall back to the first stored user
+    assert build_compact_graph(store, root='bob')['root'] == 0
@@ -0,0 +1,96 @@
+import pytest
+
+from storage import SQLiteStore
+from history import HistoryStore, encode_ids, decode_ids
+
+
+@pytest.fixture
+def history(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'store.db'))
+    yield HistoryStore(store, snapshot_every=3)
+    store.close()
+
+
+def delta_rows(history: HistoryStore) -> int:
+    return history.conn.execute('SELECT COUNT(*) FROM history_deltas').fetchone()[0]
+
+
+def snapshot_rows(history: HistoryStore) -> int:
+    return history.conn.execute('SELECT COUNT(*) FROM history_snapshots').fetchone()[0]
+
+
+def test_encode_decode_ids_round_trip():
+    ids = [500, 3, 70000, 4, 1]
+    assert decode_ids(encode_ids(ids)) == sorted(ids)
+    assert decode_ids(encode_ids([])) == []
+
+
+def test_first_list_is_a_snapshot_not_a_change(history):
+    history.record_list('u', 'followers', ['a', 'b'], ts=10)
+    assert delta_rows(history) == 0
+    assert snapshot_rows(history) == 1
+    assert history.changes('u', 'followers', 0, 100) == ([], [])
+
+
+def test_only_changes_are_stored(history):
+    history.record_list('u', 'followers', ['a', 'b'], ts=10)
+    history.record_list('u', 'followers', ['a', 'b'], ts=20)
+    assert delta_rows(history) == 0
+
+    history.record_list('u', 'followers', ['a', 'c'], ts=30)
+    assert delta_rows(history) == 2
+    assert history.changes('u', 'followers', 20, 30) == (['c'], ['b'])
+
+
+def test_as_of_reconstructs_earlier_lists(history):
+    history.record_list('u', 'followers', ['a', 'b'], ts=10)
+    history.record_list('u', 'followers', ['a', 'c'], ts=20)
+    history.record_list('u', 'followers', ['c', 'd'], ts=30)
+
+    assert history.as_of('u', 'followers', 5) is None
+    assert history.as_of('u', 'followers', 10) == {'a', 'b'}
+    assert history.as_of('u', 'followers', 25) == {'a', 'c'}
+    assert history.as_of('u', 'followers', 30) == {'c', 'd'}
+    assert history.as_of('nobody', 'followers', 30) is None
+
+
+def test_kinds_are_kept_apart(history):
+    history.record_list('u', 'followers', ['a'], ts=10)
+    history.record_list('u', 'following', ['b'], ts=10)
+    assert history.as_of('u', 'followers', 10) == {'a'}
+    assert history.as_of('u', 'following', 10) == {'b'}
+
+
+def test_follow_and_unfollow_inside_the_window_cancel_out(history):
+    history.record_list('u', 'followers', ['a'], ts=10)
+    history.record_list('u', 'followers', ['a', 'b'], ts=20)
+    history.record_list('u', 'followers', ['a'], ts=30)
+    history.record_list('u', 'followers', [], ts=40)
+
+    assert history.changes('u', 'followers', 10, 30) == ([], [])
+    assert history.changes('u', 'followers', 10, 40) == ([], ['a'])
+    assert history.changes('u', 'followers', 15, 25) == (['b'], [])
+
+
+def test_snapshots_bound_the_replay(history):
+    # snapshot_every=3: a new snapshot once three changes have piled up
+    history.record_list('u', 'followers', [], ts=0)
+    for ts in range(1, 7):
+        history.record_list('u', 'followers', [f'user{i}' for i in range(ts)], ts=ts)
+    assert snapshot_rows(history) == 3
+
+    for ts in range(1, 7):
+        assert history.as_of('u', 'followers', ts) == {f'user{i}' for i in range(ts)}
+
+
+def test_graph_as_of(history):
+    history.record_list('u', 'followers', ['a'], ts=10)
+    history.record_list('u', 'following', ['b'], ts=10)
+    history.record_list('v', 'followers', ['u'], ts=20)
+    history.record_list('u', 'followers', ['a', 'c'], ts=30)
+
+    assert history.graph_as_of(15) == {'u': {'followers': ['a'], 'following': ['b']}}
+    assert history.graph_as_of(30) == {
+        'u': {'followers': ['a', 'c'], 'following': ['b']},
+        'v': {'followers': ['u'], 'following': []},
+    }
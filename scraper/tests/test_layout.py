@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from layout import _build_quadtree, _repulsion, force_layout
+
+
+def exact_repulsion(pos: np.ndarray, k2: float) -> np.ndarray:
+    delta = pos[:, None, :] - pos[None, :, :]
+    d2 = (delta ** 2).sum(axis=2) + 1e-9
+    np.fill_diagonal(d2, np.inf)
+    return (delta * (k2 / d2)[:, :, None]).sum(axis=1)
+
+
+@pytest.mark.parametrize('spread', ['even', 'outlier', 'clustered'])
+def test_repulsion_matches_exact_forces(spread):
+    rng = np.random.default_rng(0)
+    pos = rng.uniform(-1, 1, (1500, 2)) * 2000
+    if spread == 'outlier':
+        pos[0] = (1e9, 1e9)
+    elif spread == 'clustered':
+        pos[:1000] = rng.normal(size=(1000, 2)) * 5
+
+    approx = _repulsion(pos, 1e4)
+    exact = exact_repulsion(pos, 1e4)
+    assert np.linalg.norm(approx - exact) / np.linalg.norm(exact) < 0.02
+
+
+def test_quadtree_leaves_stay_small_with_an_outlier():
+    # A uniform grid sized by the bounding box would put every node but one in the same cell
+    rng = np.random.default_rng(0)
+    pos = rng.normal(size=(5000, 2)) * 100
+    pos[0] = (1e9, 1e9)
+    tree = _build_quadtree(pos, leaf_size=8)
+
+    assert tree['leaf_count'].max() <= 8
+    assert tree['leaf_count'].sum() == len(pos)
+    assert sorted(tree['members']) == list(range(len(pos)))
+
+
+def test_repulsion_with_coincident_nodes_is_finite():
+    pos = np.zeros((2000, 2))
+    pos[:5] = [[1, 0], [0, 1], [-1, 0], [0, -1], [5, 5]]
+    assert np.isfinite(_repulsion(pos, 1e4)).all()
+
+
+def test_force_layout_keeps_fixed_nodes_in_place():
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(-500, 500, (50, 2))
+    movable = np.zeros(50, dtype=bool)
+    movable[:10] = True
+    src = np.arange(49)
+    dst = np.arange(1, 50)
+
+    pos = force_layout(50, src, dst, positions, movable, iterations=20)
+    assert np.array_equal(pos[10:], positions[10:])
+    assert not np.array_equal(pos[:10], positions[:10])
@@ -0,0 +1,163 @@
+import io
+import json
+import time
+
+import pytest
+
+from storage import SQLiteStore
+from frontier import CrawlFrontier, DONE, FAILED, IN_PROGRESS
+from history import HistoryStore
+from delta import END_OF_LIST, KNOWN_RUN, INTERRUPTED
+from pipeline import ResultWriter, PersistPipeline, FULL, DELTA
+from sinks import NDJSONSink
+
+PROFILE = {'profile_name': 'Alice', 'followers_count': 3, 'following_count': 2, 'is_private': False}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'store.db'))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def writer(store):
+    return ResultWriter(store, CrawlFrontier(store), HistoryStore(store), max_depth=1)
+
+
+def result(mode, followers, following, stopped=(END_OF_LIST, END_OF_LIST), username='alice'):
+    return {
+        'username': username,
+        'mode': mode,
+        'profile': PROFILE,
+        'followers': followers,
+        'following': following,
+        'stopped': dict(zip(('followers', 'following'), stopped)),
+    }
+
+
+def test_full_result_is_saved_and_completed(store, writer):
+    lists = writer.write([result(FULL, ['bob', 'carol', 'Follow'], ['dan'])])
+
+    assert lists == [(['bob', 'carol'], ['dan'])]
+    stored = store.get_user('alice')
+    assert stored['followers'] == ['bob', 'carol'] and stored['following'] == ['dan']
+    assert store.get_timestamps('alice')[1] is not None
+    assert writer.frontier.status('alice') == DONE
+    assert 'bob' in writer.frontier
+
+
+def test_interrupted_full_result_is_refused(store, writer):
+    with pytest.raises(RuntimeError, match='Following of alice only partly read'):
+        writer.write([result(FULL, ['bob'], ['dan'], stopped=(END_OF_LIST, INTERRUPTED))])
+
+    assert store.get_user('alice') is None
+    assert store.get_timestamps('alice') == (None, None)
+    assert writer.frontier.status('alice') is None
+
+
+def test_interrupted_delta_result_adds_but_keeps_the_lists_stale(store, writer):
+    writer.write([result(FULL, ['bob', 'carol'], ['dan'])])
+    store.conn.execute("UPDATE users SET connections_updated = 1 WHERE username = 'alice'")
+
+    writer.write([result(DELTA, ['erin'], ['dan'], stopped=(INTERRUPTED, KNOWN_RUN))])
+
+    stored = store.get_user('alice')
+    # Nothing is removed from a list that was cut short
+    assert stored['followers'] == ['erin', 'bob', 'carol']
+    assert store.get_timestamps('alice')[1] == 1
+
+
+def test_complete_delta_result_refreshes_the_lists(store, writer):
+    writer.write([result(FULL, ['bob', 'carol'], ['dan'])])
+    store.conn.execute("UPDATE users SET connections_updated = 1 WHERE username = 'alice'")
+
+    writer.write([result(DELTA, ['erin', 'bob'], ['dan'])])
+
+    assert store.get_user('alice')['followers'] == ['erin', 'bob']
+    assert store.get_timestamps('alice')[1] > 1
+
+
+def streamed_users(sink: NDJSONSink) -> list:
+    lines = [json.loads(line) for line in sink.stream.getvalue().splitlines()]
+    return [line['username'] for line in lines if line['type'] == 'user']
+
+
+def test_pipeline_writes_completes_and_streams(tmp_path):
+    path = str(tmp_path / 'store.db')
+    sink = NDJSONSink(io.StringIO())
+    pipeline = PersistPipeline(path, max_depth=1, sink=sink).start()
+    for name in ('alice', 'bob'):
+        pipeline.submit(result(FULL, [f'{name}_follower'], [], username=name))
+    pipeline.close()
+
+    assert not pipeline.thread.is_alive()
+    assert (pipeline.written, pipeline.failed) == (2, 0)
+    assert streamed_users(sink) == ['alice', 'bob']
+    store = SQLiteStore(path)
+    frontier = CrawlFrontier(store)
+    assert frontier.status('alice') == DONE and frontier.status('bob') == DONE
+    assert frontier.depth('alice_follower') == 1
+    store.close()
+
+
+def test_failed_batch_is_written_one_by_one(tmp_path):
+    path = str(tmp_path / 'store.db')
+    store = SQLiteStore(path)
+    frontier = CrawlFrontier(store)
+    for name in ('alice', 'bob', 'carol'):
+        frontier.mark_in_progress(name)
+    sink = NDJSONSink(io.StringIO())
+    pipeline = PersistPipeline(path, max_depth=1, batch_size=10, sink=sink)
+    # Queued before the worker starts, so all three land in one batch
+    pipeline.queue.put(result(FULL, ['x'], [], username='alice'))
+    pipeline.queue.put(result(FULL, ['x'], [], stopped=(INTERRUPTED, END_OF_LIST), username='bob'))
+    pipeline.queue.put(result(FULL, ['x'], [], username='carol'))
+    pipeline.start().close()
+
+    assert (pipeline.written, pipeline.failed) == (2, 1)
+    assert streamed_users(sink) == ['alice', 'carol']
+    assert store.get_user('bob') is None
+    assert frontier.status('bob') == FAILED
+    assert frontier.status('alice') == DONE and frontier.status('carol') == DONE
+    store.close()
+
+
+def test_drain_waits_for_everything_submitted(tmp_path):
+    path = str(tmp_path / 'store.db')
+    pipeline = PersistPipeline(path, max_depth=1, batch_size=2, queue_size=2).start()
+    for i in range(10):
+        pipeline.submit(result(FULL, [f'f{i}'], [], username=f'user{i}'))
+    pipeline.drain()
+
+    store = SQLiteStore(path)
+    assert store.user_count() == 10
+    store.close()
+    pipeline.close()
+    # Closing again is harmless and nothing can be submitted after it
+    pipeline.close()
+    with pytest.raises(RuntimeError):
+        pipeline.submit(result(FULL, [], [], username='late'))
+
+
+def test_writer_waits_for_the_crawl_connection(tmp_path):
+    # The crawl marks users from its own connection while the worker writes
+    path = str(tmp_path / 'store.db')
+    store = SQLiteStore(path)
+    assert store.conn.execute('PRAGMA busy_timeout').fetchone()[0] >= 60_000
+    frontier = CrawlFrontier(store)
+    pipeline = PersistPipeline(path, max_depth=2, batch_size=5).start()
+
+    store.conn.execute('BEGIN IMMEDIATE')
+    for i in range(10):
+        pipeline.submit(result(FULL, [f'f{i}_{j}' for j in range(200)], [], username=f'user{i}'))
+    time.sleep(0.5)
+    store.conn.commit()
+    for i in range(10):
+        frontier.mark_in_progress(f'other{i}')
+    pipeline.close()
+
+    assert (pipeline.written, pipeline.failed) == (10, 0)
+    assert frontier.counts() == {DONE: 10, 'pending': 2000, IN_PROGRESS: 10}
+    store.close()
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from profile_parser import parse_profile_header, convert_count_to_number
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def parse_fixture(name: str) -> dict:
+    with open(os.path.join(FIXTURES, name), 'r') as f:
+        return parse_profile_header(f.read())
+
+
+def test_public_profile_reads_counts_from_links():
+    header = parse_fixture('profile_public.html')
+    assert header == {
+        'profile_name': 'Alice Smith',
+        'followers_text': '1,234 followers',
+        'following_text': '567 following',
+        'is_private': False,
+    }
+
+
+def test_private_profile_reads_counts_from_header_text():
+    header = parse_fixture('profile_private.html')
+    assert header == {
+        'profile_name': 'Carol P.',
+        'followers_text': '2,048 followers',
+        'following_text': '311 following',
+        'is_private': True,
+    }
+
+
+def test_profile_without_links_or_name():
+    header = parse_fixture('profile_no_links.html')
+    assert header == {
+        'profile_name': '',
+        'followers_text': '0 followers',
+        'following_text': '0 following',
+        'is_private': False,
+    }
+
+
+def test_abbreviated_counts():
+    header = parse_fixture('profile_abbreviated.html')
+    assert header['profile_name'] == 'Dana & Co'
+    assert header['followers_text'] == '61.2K followers'
+    assert header['following_text'] == '1.5M following'
+    assert convert_count_to_number(header['followers_text']) == 61200
+    assert convert_count_to_number(header['following_text']) == 1500000
+
+
+def test_page_without_header():
+    header = parse_profile_header('<main><p>Sorry, this page isn\'t available.</p></main>')
+    assert header == {'profile_name': '', 'followers_text': '', 'following_text': '', 'is_private': False}
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('0', 0),
+    ('567', 567),
+    ('1,234', 1234),
+    ('1,234 followers', 1234),
+    ('61.2k', 61200),
+    ('61.2K followers', 61200),
+    ('3k', 3000),
+    ('1.2M', 1200000),
+    (' 12m following ', 12000000),
+])
+def test_convert_count_to_number(text, expected):
+    assert convert_count_to_number(text) == expected
+
+
+@pytest.mark.parametrize('text', ['', 'followers', 'n/a'])
+def test_convert_count_to_number_unreadable(text):
+    assert convert_count_to_number(text) == 0
@@ -0,0 +1,86 @@
+import pytest
+
+from rate_limiter import RequestScheduler
+
+
+class FakeClock:
+    """Clock whose sleep just moves time forward."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_scheduler(clock: FakeClock, requests_per_hour: int = 3600, batch_size: int = 3,
+                   batch_cooldown: float = 60.0, burst: int = 2) -> RequestScheduler:
+    return RequestScheduler(requests_per_hour, batch_size, batch_cooldown, burst=burst,
+                            clock=clock, sleep=clock.sleep)
+
+
+def test_burst_is_free_then_waits_for_refill():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, requests_per_hour=3600, burst=2)
+
+    assert scheduler.acquire() == 0
+    assert scheduler.acquire() == 0
+    # One token per second at 3600 requests per hour
+    assert scheduler.acquire() == pytest.approx(1.0)
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_tokens_refill_while_idle_up_to_burst():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, requests_per_hour=3600, burst=2)
+    scheduler.acquire()
+    scheduler.acquire()
+
+    clock.now += 100
+    assert scheduler.stats()['tokens_left'] == 2
+    assert scheduler.acquire() == 0
+    assert scheduler.acquire() == 0
+
+
+def test_cooldown_after_batch_of_users():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, batch_size=2, batch_cooldown=60, burst=10)
+    for _ in range(2):
+        scheduler.acquire('navigation')
+        scheduler.finish_item()
+
+    assert scheduler.acquire('navigation') == pytest.approx(60)
+    assert clock.sleeps == [60]
+    assert scheduler.stats()['batch_items'] == 0
+
+
+def test_users_without_requests_do_not_count_towards_a_batch():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, batch_size=2, batch_cooldown=60, burst=10)
+    # Served from the store: no request, no cool-down however many there are
+    for _ in range(5):
+        scheduler.finish_item()
+    assert scheduler.stats()['batch_items'] == 0
+
+    scheduler.acquire('navigation')
+    scheduler.acquire('dialog')
+    scheduler.finish_item()
+    assert scheduler.stats()['batch_items'] == 1
+    assert scheduler.acquire('navigation') == 0
+
+
+def test_stats_count_requests_per_kind():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, burst=10)
+    scheduler.acquire('navigation')
+    scheduler.acquire('navigation')
+    scheduler.acquire('dialog')
+
+    stats = scheduler.stats()
+    assert stats['requests'] == {'navigation': 2, 'dialog': 1}
+    assert stats['total_requests'] == 3
@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from storage import SQLiteStore
+from shards import export_shards, shard_count
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'store.db'))
+    store.save_user('me', {'followers': ['alice'], 'following': ['alice', 'bob'], 'followers_count': 1})
+    store.save_user('alice', {'followers': ['me'], 'following': [], 'profile_name': 'Alice'})
+    yield store
+    store.close()
+
+
+def export(store, tmp_path, **kwargs):
+    directory = str(tmp_path / 'shards')
+    index_path = str(tmp_path / 'index.json')
+    sizes = export_shards(store, directory, index_path, **kwargs)
+    with open(index_path) as f:
+        return sizes, json.load(f), directory
+
+
+def load_shard(directory: str, name: str) -> dict:
+    with open(os.path.join(directory, f'{name}.json')) as f:
+        return json.load(f)
+
+
+def test_shard_count_grows_in_powers_of_two():
+    assert shard_count(0, 100) == 1
+    assert shard_count(100, 100) == 1
+    assert shard_count(101, 100) == 2
+    assert shard_count(1000, 100) == 16
+    assert shard_count(1601, 100) == 32
+
+
+def test_index_points_at_each_users_shard(store, tmp_path):
+    sizes, index, directory = export(store, tmp_path, buckets=8)
+
+    assert sizes['users'] == 2
+    assert index['root'] == 'me'
+    assert index['buckets'] == 8
+    shard_name, followers_count, following_count, is_celebrity = index['users']['me']
+    assert (followers_count, following_count, is_celebrity) == (1, 0, 0)
+    assert load_shard(directory, shard_name)['me']['following'] == ['alice', 'bob']
+    assert load_shard(directory, index['users']['alice'][0])['alice']['profile_name'] == 'Alice'
+
+
+def test_bucket_count_follows_the_size_of_the_store(store, tmp_path):
+    assert export(store, tmp_path)[1]['buckets'] == 1
+
+    # 30 more users with 400 list entries each: 12,036 entries, past one shard's worth
+    for i in range(30):
+        store.save_user(f'user{i}', {'followers': [f'f{i}_{j}' for j in range(400)], 'following': []})
+    sizes, index, _ = export(store, tmp_path)
+    assert index['buckets'] == 2
+    assert sizes['shards'] == 2
+
+
+def test_root_and_positions(store, tmp_path):
+    positions = {'me': (0.0, 0.0), 'alice': (1.0, 2.0)}
+    _, index, directory = export(store, tmp_path, root='alice', positions=positions)
+
+    assert index['root'] == 'alice'
+    me = load_shard(directory, index['users']['me'][0])['me']
+    # bob has no position and is left out
+    assert me['positions'] == {'me': [0.0, 0.0], 'alice': [1.0, 2.0]}
+
+    # A root that was not crawled falls back to the first stored user
+    assert export(store, tmp_path, root='bob')[1]['root'] == 'me'
+
+
+def test_unchanged_shards_keep_their_names(store, tmp_path):
+    _, before, directory = export(store, tmp_path, buckets=8)
+    store.save_user('alice', {'followers': ['me', 'carol'], 'following': []})
+    _, after, _ = export(store, tmp_path, buckets=8)
+
+    assert after['users']['alice'][0] != before['users']['alice'][0]
+    if before['users']['me'][0] != before['users']['alice'][0]:
+        assert after['users']['me'][0] == before['users']['me'][0]
+    # Shards nobody points at any more are removed
+    assert sorted(os.listdir(directory)) == sorted({f'{entry[0]}.json' for entry in after['users'].values()})
@@ -0,0 +1,100 @@
+import json
+import time
+from typing import Any, Callable, Optional
+from profile_parser import PRIVATE_MARKER
+
+# The profile header is there and shows its counts, as links or as text
+PROFILE_HEADER_READY_SCRIPT = """
+if (document.readyState !== 'complete') return false;
+const header = document.querySelector('header section');
+if (!header) return false;
+return !!document.querySelector("a[href*='/followers'], a[href*='/following']")
+    || /followers|following/i.test(header.textContent)
+    || (document.querySelector('main') || document.body).textContent.includes(PRIVATE_MARKER);
+""".replace('PRIVATE_MARKER', json.dumps(PRIVATE_MARKER))
+
+
+class Waiter:
+    """Polls a readiness condition and returns as soon as it holds.
+
+    Replaces fixed sleeps: a wait costs only as long as the page actually
+    needs, bounded by timeout. minimum keeps a pacing floor, so a phase never
+    finishes faster than the rate configuration allows even when the page is
+    already ready.
+    """
+
+    def __init__(self, driver, timeout: float = 10.0, poll: float = 0.1,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.driver = driver
+        self.timeout = timeout
+        self.poll = poll
+        self.clock = clock
+        self.sleep = sleep
+
+    def until(self, condition: Callable[[], Any], timeout: float = None, minimum: float = 0.0) -> Optional[Any]:
+        """Wait for condition() to return something truthy.
+        Args:
+            condition: Called every poll interval; exceptions count as not ready
+            timeout: Seconds to wait before giving up, defaults to self.timeout
+            minimum: Seconds that must pass before returning even if ready
+        Returns:
+            The truthy value, or None on timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = self.clock()
+        result = None
+        while True:
+            try:
+                result = condition()
+            except Exception:
+                result = None
+            elapsed = self.clock() - start
+            if result or elapsed >= timeout:
+                break
+            self.sleep(self.poll)
+
+        remaining = minimum - (self.clock() - start)
+        if remaining > 0:
+            self.sleep(remaining)
+        return result or None
+
+    def for_script(self, script: str, *args, timeout: float = None, minimum: float = 0.0) -> Optional[Any]:
+        """Wait for an in-page script to return something truthy, one round trip per poll."""
+        return self.until(lambda: self.driver.execute_script(script, *args), timeout, minimum)
+
+    def for_profile_header(self, timeout: float = None, minimum: float = 0.0) -> bool:
+        """Wait for the profile header with its follower/following counts.
+
+        Public profiles show the counts as links; private profiles and zero
+        counts show them as plain text, so the header text or the private
+        account notice count as ready too.
+        """
+        return bool(self.for_script(PROFILE_HEADER_READY_SCRIPT, timeout=timeout, minimum=minimum))
+
+    def for_dialog_list(self, dialog, timeout: float = None, minimum: float = 0.0) -> bool:
+        """Wait for the followers/following dialog to contain at least one user link."""
+        return bool(self.for_script(
+            "return !!arguments[0].querySelector(\"a[role='link']\")",
+            dialog, timeout=timeout, minimum=minimum
+        ))
+
+    def for_dialog_closed(self, timeout: float = None, minimum: float = 0.0) -> bool:
+        return bool(self.for_script(
+            "return !document.querySelector(\"div[role='dialog']\")",
+            timeout=timeout, minimum=minimum
+        ))
+
+    def for_stable_height(self, element, settle: float = 0.3, timeout: float = None, minimum: float = 0.0) -> bool:
+        """Wait until element.scrollHeight has stopped changing for settle seconds."""
+        state = {'height': None, 'since': self.clock()}
+
+        def stable():
+            height = self.driver.execute_script("return arguments[0].scrollHeight", element)
+            now = self.clock()
+            if height != state['height']:
+                state['height'] = height
+                state['since'] = now
+                return False
+            return now - state['since'] >= settle
+
+        return bool(self.until(stable, timeout, minimum))
@@ -1,37 +1,53 @@
-import React, { useEffect, useState } from 'react';
+import React, { useCallback, useEffect, useState } from 'react';
 import NetworkGraph from './components/NetworkGraph';
+import { loadEgoGraph, loadIndex } from './data/shards';
+import { CompactGraph, ShardIndex } from './types/graph';
 import './App.css';
 
-interface UserData {
-  followers_count: number;
-  following_count: number;
-  is_celebrity: boolean;
-  followers: string[];
-  following: string[];
-}
-
-interface NetworkData {
-  [username: string]: UserData;
+function loadFullGraph(): Promise<CompactGraph> {
+  return fetch('/graph.json').then(response => {
+    console.log('Response received:', response.status);
+    if (!response.ok) {
+      throw new Error('Failed to load network data');
+    }
+    return response.json();
+  });
 }
 
 function App() {
-  const [networkData, setNetworkData] = useState<NetworkData | null>(null);
+  const [index, setIndex] = useState<ShardIndex | null>(null);
+  // User whose one-hop network is shown; null shows the full network
+  const [focus, setFocus] = useState<string | null>(null);
+  const [graph, setGraph] = useState<CompactGraph | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
+  // Startup only needs the small index; the main user's shard is loaded next
   useEffect(() => {
-    console.log('Fetching network data...');
-    fetch('/user_data.json')
-      .then(response => {
-        console.log('Response received:', response.status);
-        if (!response.ok) {
-          throw new Error('Failed to load network data');
-        }
-        return response.json();
-      })
+    console.log('Fetching network index...');
+    loadIndex()
       .then(data => {
-        console.log('Data loaded successfully:', Object.keys(data).length, 'users');
-        setNetworkData(data);
+        console.log('Index loaded successfully:', Object.keys(data.users).length, 'users');
+        setIndex(data);
+        setFocus(data.root);
+      })
+      .catch(err => {
+        console.error('Error loading index:', err);
+        setError(err.message);
+        setLoading(false);
+      });
+  }, []);
+
+  useEffect(() => {
+    if (!index) {
+      return;
+    }
+    console.log('Fetching network data...', focus ?? 'full network');
+    setLoading(true);
+    (focus ? loadEgoGraph(index, focus) : loadFullGraph())
+      .then((data: CompactGraph) => {
+        console.log('Data loaded successfully:', data.nodes.id.length, 'nodes,', data.edges.indices.length, 'edges');
+        setGraph(data);
         setLoading(false);
       })
       .catch(err => {
@@ -39,7 +55,14 @@ function App() {
         setError(err.message);
         setLoading(false);
       });
-  }, []);
+  }, [index, focus]);
+
+  // Clicking a crawled user opens their network, fetching only their shard
+  const handleNodeClick = useCallback((username: string) => {
+    if (index?.users[username]) {
+      setFocus(username);
+    }
+  }, [index]);
 
   if (loading) {
     return <div className="loading">Loading network data...</div>;
@@ -49,7 +72,7 @@ function App() {
     return <div className="error">Error: {error}</div>;
   }
 
-  if (!networkData) {
+  if (!graph || !index) {
     return <div className="error">No network data available</div>;
   }
 
@@ -57,12 +80,17 @@ function App() {
     <div className="App">
       <header className="App-header">
         <h1>Instagram Network Visualization</h1>
+        {focus ? (
+          <button onClick={() => setFocus(null)}>Show full network</button>
+        ) : (
+          <button onClick={() => setFocus(index.root)}>Show {index.root}'s network</button>
+        )}
       </header>
       <main>
-        <NetworkGraph data={networkData} />
+        <NetworkGraph graph={graph} onNodeClick={handleNodeClick} />
       </main>
     </div>
   );
 }
 
-export default App; 
\ No newline at end of file
+export default App;
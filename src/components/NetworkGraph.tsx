@@ -1,18 +1,6 @@
 import React, { useEffect, useRef } from 'react';
 import * as d3 from 'd3';
-
-interface UserData {
-  followers_count: number;
-  following_count: number;
-  is_celebrity: boolean;
-  followers: string[];
-  following: string[];
-  profile_name?: string;
-}
-
-interface NetworkData {
-  [username: string]: UserData;
-}
+import { CompactGraph } from '../types/graph';
 
 interface Node {
   id: string;
@@ -27,86 +15,52 @@ interface Node {
 }
 
 interface Link {
-  source: string;
-  target: string;
+  source: number;
+  target: number;
   type: 'follower' | 'following';
 }
 
 interface NetworkGraphProps {
-  data: NetworkData;
+  graph: CompactGraph;
+  onNodeClick?: (username: string) => void;
 }
 
-const NetworkGraph: React.FC<NetworkGraphProps> = ({ data }) => {
+const NetworkGraph: React.FC<NetworkGraphProps> = ({ graph, onNodeClick }) => {
   const svgRef = useRef<SVGSVGElement>(null);
 
   useEffect(() => {
-    console.log('NetworkGraph useEffect triggered with data:', data);
-    if (!svgRef.current || !data) {
-      console.log('Missing requirements:', { svgRef: !!svgRef.current, data: !!data });
+    console.log('NetworkGraph useEffect triggered with graph:', graph);
+    if (!svgRef.current || !graph) {
+      console.log('Missing requirements:', { svgRef: !!svgRef.current, graph: !!graph });
       return;
     }
 
     // Clear previous graph
     d3.select(svgRef.current).selectAll("*").remove();
 
-    // Prepare nodes and links
-    const nodes: Node[] = [];
-    const links: Link[] = [];
-    const processedNodes = new Set<string>();
-
-    // Create nodes
-    Object.entries(data).forEach(([username, userData]) => {
-      nodes.push({
-        id: username,
-        followers_count: userData.followers_count,
-        following_count: userData.following_count,
-        is_celebrity: userData.is_celebrity,
-        profile_name: userData.profile_name
-      });
-      processedNodes.add(username);
-
-      // Create links for followers and following
-      userData.followers.forEach(follower => {
-        if (!processedNodes.has(follower)) {
-          const followerData = data[follower] || {
-            followers_count: 0,
-            following_count: 0,
-            is_celebrity: false
-          };
-          nodes.push({
-            id: follower,
-            followers_count: followerData.followers_count,
-            following_count: followerData.following_count,
-            is_celebrity: followerData.is_celebrity,
-          });
-          processedNodes.add(follower);
-        }
-        links.push({ source: follower, target: username, type: 'follower' });
-      });
-
-      userData.following.forEach(following => {
-        if (!processedNodes.has(following)) {
-          const followingData = data[following] || {
-            followers_count: 0,
-            following_count: 0,
-            is_celebrity: false
-          };
-          nodes.push({
-            id: following,
-            followers_count: followingData.followers_count,
-            following_count: followingData.following_count,
-            is_celebrity: followingData.is_celebrity,
-          });
-          processedNodes.add(following);
-        }
-        links.push({ source: username, target: following, type: 'following' });
-      });
-    });
+    // Nodes and links come straight from the precomputed arrays; node i is
+    // nodes[i], so links can refer to nodes by index
+    const { id, followers_count, following_count, is_celebrity, profile_name } = graph.nodes;
+    const nodes: Node[] = id.map((username, i) => ({
+      id: username,
+      followers_count: followers_count[i],
+      following_count: following_count[i],
+      is_celebrity: is_celebrity[i] === 1,
+      profile_name: profile_name[i] || undefined
+    }));
+
+    const { indptr, indices, kind } = graph.edges;
+    const links: Link[] = new Array(indices.length);
+    for (let source = 0; source < nodes.length; source++) {
+      for (let e = indptr[source]; e < indptr[source + 1]; e++) {
+        links[e] = { source, target: indices[e], type: kind[e] & 2 ? 'following' : 'follower' };
+      }
+    }
 
     console.log('Processed data:', { nodes: nodes.length, links: links.length });
 
     // Calculate node size scale based on follower counts
-    const maxFollowers = Math.max(...nodes.map(n => n.followers_count));
+    const maxFollowers = d3.max(nodes, n => n.followers_count) ?? 0;
     const nodeSizeScale = d3.scaleSqrt()
       .domain([0, maxFollowers])
       .range([5, 30]);  // Min and max node sizes
@@ -134,17 +88,31 @@ const NetworkGraph: React.FC<NetworkGraphProps> = ({ data }) => {
 
     svg.call(zoom);
 
+    // Use the layout precomputed by the scraper when there is one: every node is
+    // pinned at its position, so the simulation never has to run
+    const { x: layoutX, y: layoutY } = graph.nodes;
+    const precomputed = !!(layoutX && layoutY);
+    if (layoutX && layoutY) {
+      // Shift so the main user sits at the center of the view
+      const offsetX = width / 2 - layoutX[graph.root];
+      const offsetY = height / 2 - layoutY[graph.root];
+      nodes.forEach((n, i) => {
+        n.x = n.fx = layoutX[i] + offsetX;
+        n.y = n.fy = layoutY[i] + offsetY;
+      });
+    }
+
     // Create simulation
     const simulation = d3.forceSimulation(nodes as any)
-      .force('link', d3.forceLink(links).id((d: any) => d.id).distance(100))
+      .force('link', d3.forceLink(links).distance(100))
       .force('charge', d3.forceManyBody().strength(-300))  // Increased repulsion
       .force('x', d3.forceX(width / 2).strength(0.1))  // Keep nodes centered horizontally
       .force('y', d3.forceY(height / 2).strength(0.1))  // Keep nodes centered vertically
       .force('collision', d3.forceCollide().radius((d: any) => nodeSizeScale(d.followers_count) + 5));
 
-    // Get the main user (first user in the data)
-    const mainUsername = Object.keys(data)[0];
-    const mainNode = nodes.find(n => n.id === mainUsername);
+    // Get the main user
+    const mainNode = nodes[graph.root];
+    const mainUsername = mainNode?.id;
 
     if (mainNode) {
       // Fix the main node position at the center
@@ -211,6 +179,7 @@ const NetworkGraph: React.FC<NetworkGraphProps> = ({ data }) => {
         .selectAll('g')
         .data(nodes)
         .join('g')
+        .on('click', (_event, d) => onNodeClick?.(d.id))
         .call(d3.drag<any, any>()
           .on('start', dragstarted)
           .on('drag', dragged)
@@ -247,7 +216,7 @@ const NetworkGraph: React.FC<NetworkGraphProps> = ({ data }) => {
         });
 
       // Update gradient positions and links on each tick
-      simulation.on('tick', () => {
+      const ticked = () => {
         // Keep main node fixed at center
         if (mainNode) {
           mainNode.x = width / 2;
@@ -272,7 +241,14 @@ const NetworkGraph: React.FC<NetworkGraphProps> = ({ data }) => {
 
         node
           .attr('transform', (d: any) => `translate(${d.x},${d.y})`);
-      });
+      };
+      simulation.on('tick', ticked);
+
+      if (precomputed) {
+        // Positions are final already: draw once instead of simulating
+        simulation.stop();
+        ticked();
+      }
 
       // Drag functions
       function dragstarted(event: any) {
@@ -294,8 +270,8 @@ const NetworkGraph: React.FC<NetworkGraphProps> = ({ data }) => {
 
       function dragended(event: any) {
         if (!event.active) simulation.alphaTarget(0);
-        // Don't allow dragging the main node
-        if (event.subject.id !== mainUsername) {
+        // Don't allow dragging the main node; with a precomputed layout nodes stay where they are dropped
+        if (event.subject.id !== mainUsername && !precomputed) {
           event.subject.fx = null;
           event.subject.fy = null;
         }
@@ -326,7 +302,7 @@ const NetworkGraph: React.FC<NetworkGraphProps> = ({ data }) => {
     return () => {
       simulation.stop();
     };
-  }, [data]);
+  }, [graph, onNodeClick]);
 
   return (
     <div className="network-graph" style={{ width: '100%', height: 'calc(100vh - 80px)', position: 'relative' }}>
@@ -0,0 +1,91 @@
+import { CompactGraph, ShardIndex, ShardUser } from '../types/graph';
+
+// Shards are content-addressed, so a fetched shard never changes and can be
+// kept for the lifetime of the page
+const shardCache = new Map<string, Promise<{ [username: string]: ShardUser }>>();
+
+export async function loadIndex(): Promise<ShardIndex> {
+  const response = await fetch('/index.json');
+  if (!response.ok) {
+    throw new Error('Failed to load network index');
+  }
+  return response.json();
+}
+
+export function loadUser(index: ShardIndex, username: string): Promise<ShardUser | null> {
+  const entry = index.users[username];
+  if (!entry) {
+    return Promise.resolve(null);
+  }
+  const shard = entry[0];
+  if (!shardCache.has(shard)) {
+    shardCache.set(shard, fetch(`/shards/${shard}.json`).then(response => {
+      if (!response.ok) {
+        shardCache.delete(shard);
+        throw new Error(`Failed to load shard ${shard}`);
+      }
+      return response.json();
+    }));
+  }
+  return shardCache.get(shard)!.then(users => users[username] ?? null);
+}
+
+// Build the one-hop network around a user in the compact graph format, so
+// NetworkGraph can draw it exactly like the full export, pinned at the
+// precomputed positions when the shard has them
+export async function loadEgoGraph(index: ShardIndex, username: string): Promise<CompactGraph> {
+  const user = await loadUser(index, username);
+  if (!user) {
+    throw new Error(`No data for ${username}`);
+  }
+
+  const ids = new Map<string, number>([[username, 0]]);
+  const intern = (name: string) => {
+    if (!ids.has(name)) {
+      ids.set(name, ids.size);
+    }
+    return ids.get(name)!;
+  };
+  user.following.forEach(intern);
+  user.followers.forEach(intern);
+
+  // CSR by source: the ego's following edges first, then one edge per follower
+  const indptr = new Array(ids.size + 1).fill(0);
+  const indices: number[] = [];
+  const kind: number[] = [];
+  user.following.forEach(name => {
+    indices.push(ids.get(name)!);
+    kind.push(2);
+  });
+  indptr[1] = indices.length;
+  const followerIds = new Set(user.followers.map(name => ids.get(name)!));
+  for (let source = 1; source < ids.size; source++) {
+    if (followerIds.has(source)) {
+      indices.push(0);
+      kind.push(1);
+    }
+    indptr[source + 1] = indices.length;
+  }
+
+  const names = Array.from(ids.keys());
+  const attribute = (i: number) => index.users[names[i]];
+  // Reuse the full graph's layout when the shard has a position for every node
+  const positions = user.positions;
+  const layout = positions && names.every(name => positions[name])
+    ? { x: names.map(name => positions[name][0]), y: names.map(name => positions[name][1]) }
+    : {};
+  return {
+    version: index.version,
+    root: 0,
+    nodes: {
+      id: names,
+      followers_count: names.map((_, i) => attribute(i)?.[1] ?? 0),
+      following_count: names.map((_, i) => attribute(i)?.[2] ?? 0),
+      is_celebrity: names.map((_, i) => attribute(i)?.[3] ?? 0),
+      profile_name: names.map((_, i) => (i === 0 ? user.profile_name : '')),
+      crawled: names.map((_, i) => (attribute(i) ? 1 : 0)),
+      ...layout,
+    },
+    edges: { indptr, indices, kind },
+  };
+}
@@ -16,4 +16,48 @@ export interface Link {
 export interface GraphData {
     nodes: Node[];
     links: Link[];
-} 
\ No newline at end of file
+} 
+// Compact graph written by scraper/graph_export.py. Node attributes are
+// column arrays indexed by node id; edges are "source follows target" in CSR
+// form: the targets of node i are indices[indptr[i]..indptr[i + 1]).
+export interface CompactGraph {
+    version: number;
+    root: number;
+    nodes: {
+        id: string[];
+        followers_count: number[];
+        following_count: number[];
+        is_celebrity: number[];
+        profile_name: string[];
+        crawled: number[];
+        // Precomputed layout, present when the export ran the layout stage
+        x?: number[];
+        y?: number[];
+    };
+    edges: {
+        indptr: number[];
+        indices: number[];
+        // Bit 1: seen in the target's followers list, bit 2: seen in the source's following list
+        kind: number[];
+    };
+}
+
+// Sharded export written by scraper/shards.py: a small index plus one file
+// per shard holding the followers/following lists of its users
+export interface ShardIndex {
+    version: number;
+    root: string;
+    buckets: number;
+    // username -> [shard, followers_count, following_count, is_celebrity]
+    users: { [username: string]: [string, number, number, number] };
+}
+
+export interface ShardUser {
+    followers: string[];
+    following: string[];
+    profile_name: string;
+    last_updated: string | null;
+    // Layout of the full graph for this user and everyone in its lists,
+    // present when the export ran the layout stage
+    positions?: { [username: string]: [number, number] };
+}